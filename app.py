@@ -1,27 +1,169 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 import os
-import io
-import base64
-import xlsxwriter
 from behavior_tracker import BehaviorTracker
+from color_scheme import ColorScheme
 from data_manager import DataManager
+from storage import JournalStore, SQLiteStore
+from result_cache import ResultCache
+from shared_store import SharedDataManager
+from workspace import ClassWorkspace, check_class_id
+from trends import TrendAnalytics
+import reports
+import profiling
+
+# Set BEHAVIOR_DB_PATH to keep class data in a SQLite database between sessions;
+# every session then works on that one class
+BEHAVIOR_DB_PATH = os.environ.get('BEHAVIOR_DB_PATH')
+# Set BEHAVIOR_STORE=journal to keep it instead in an append-only journal with
+# snapshots in the BEHAVIOR_DB_PATH directory, which also enables undo
+BEHAVIOR_STORE = os.environ.get('BEHAVIOR_STORE', 'sqlite')
+# Set BEHAVIOR_SHARED_CLASS to a class name to share one copy of that class's
+# data between all sessions (e.g. co-teachers); ?class=<name> picks another.
+# A "{class_id}" in BEHAVIOR_DB_PATH gives each shared class its own database.
+BEHAVIOR_SHARED_CLASS = os.environ.get('BEHAVIOR_SHARED_CLASS')
+# Other classes ?class= may open, comma separated; any other name is refused
+SHARED_CLASSES = {name.strip() for name in os.environ.get('BEHAVIOR_SHARED_CLASSES', '').split(',') if name.strip()}
+# Set BEHAVIOR_WORKSPACE to a directory to host many classes, one store per
+# class (see workspace.py); ?class=<name> opens a class directly
+BEHAVIOR_WORKSPACE = os.environ.get('BEHAVIOR_WORKSPACE')
+# Memory the workspace may use for loaded classes before unloading idle ones
+WORKSPACE_MEMORY_MB = int(os.environ.get('WORKSPACE_MEMORY_MB', 512))
+# Set BEHAVIOR_COLOR_SCHEME to a JSON file to use a custom color scale (see color_scheme.py)
+BEHAVIOR_COLOR_SCHEME = os.environ.get('BEHAVIOR_COLOR_SCHEME')
+# Dates are recorded in the school's local time zone
+CLASS_TIMEZONE = ZoneInfo("America/Chicago")
+# Periods offered by the class overview, in days (None for everything)
+OVERVIEW_PERIODS = {"Last 2 weeks": 14, "Last 30 days": 30, "Last 90 days": 90, "All dates": None}
+# How merged files settle disagreements about a student's color on a day
+MERGE_POLICY_LABELS = {'last': "Later file wins", 'worst': "Keep the worse color", 'best': "Keep the better color"}
+# Choices for how many recent entries the dashboard timeline shows
+TIMELINE_WINDOWS = [10, 20, 30, 60]
+
+
+@st.cache_resource
+def load_color_scheme(path):
+    """Loads and validates a custom color scheme once per server process."""
+    return ColorScheme.from_json(path) if path else ColorScheme.default()
+
+
+@st.cache_resource
+def open_behavior_store(path):
+    """Opens the durable store once per server process."""
+    if BEHAVIOR_STORE == 'journal':
+        return JournalStore(path)
+    return SQLiteStore(path)
+
+
+@st.cache_resource
+def open_shared_class(class_id):
+    """Loads a shared class once per server process; every session gets the same object."""
+    check_class_id(class_id)
+    path = None
+    if BEHAVIOR_DB_PATH and '{class_id}' in BEHAVIOR_DB_PATH:
+        path = BEHAVIOR_DB_PATH.format(class_id=class_id)
+    elif BEHAVIOR_DB_PATH and class_id == BEHAVIOR_SHARED_CLASS:
+        path = BEHAVIOR_DB_PATH
+    store = open_behavior_store(path) if path else None
+    return SharedDataManager(DataManager(tracker=BehaviorTracker(load_color_scheme(BEHAVIOR_COLOR_SCHEME)), store=store))
+
+
+@st.cache_resource
+def open_stored_class():
+    """Loads the class kept at BEHAVIOR_DB_PATH once per server process.
+
+    The store is opened once per process, so sessions must share one
+    manager over it; separate managers would each hold their own copy, and
+    an upload in one session would replace the store under the others.
+    """
+    tracker = BehaviorTracker(load_color_scheme(BEHAVIOR_COLOR_SCHEME))
+    return SharedDataManager(DataManager(tracker=tracker, store=open_behavior_store(BEHAVIOR_DB_PATH)))
+
+
+@st.cache_resource
+def open_workspace():
+    """Opens the multi-class workspace once per server process."""
+    tracker = BehaviorTracker(load_color_scheme(BEHAVIOR_COLOR_SCHEME))
+    return ClassWorkspace(BEHAVIOR_WORKSPACE, store=BEHAVIOR_STORE, tracker=tracker, memory_budget=WORKSPACE_MEMORY_MB * 1024 * 1024)
+
+
+def current_data_manager():
+    """Returns the session's DataManager.
+
+    A workspace class's shard is held only for the current run, never in
+    the session, so an idle session does not keep an unloaded class alive.
+    """
+    return workspace_shard if BEHAVIOR_WORKSPACE else st.session_state.data_manager
+
+
+def current_result_cache():
+    """Returns the result cache that goes with current_data_manager()."""
+    return workspace_shard.result_cache if BEHAVIOR_WORKSPACE else st.session_state.result_cache
+
+
+# Spans of this script run; the sidebar performance panel shows the previous run's
+if profiling.ENABLED:
+    st.session_state.last_rerun_spans = st.session_state.get('rerun_spans', [])
+    st.session_state.rerun_spans = profiling.start_rerun()
 
 # Initialize session state
-if 'data_manager' not in st.session_state:
-    st.session_state.data_manager = DataManager()
+if 'behavior_tracker' not in st.session_state:
+    st.session_state.behavior_tracker = BehaviorTracker(load_color_scheme(BEHAVIOR_COLOR_SCHEME))
+if BEHAVIOR_WORKSPACE:
+    # The class's shard is fetched on every run and held only for the run
+    # (see current_data_manager), since the workspace may unload classes
+    # nobody has used for a while
+    workspace = open_workspace()
+    if 'class_id' not in st.session_state:
+        # ?class= only opens existing classes; new ones are added from the sidebar
+        class_ids = workspace.class_ids()
+        requested = st.query_params.get('class')
+        st.session_state.class_id = requested if requested in class_ids else next(iter(class_ids), "My Class")
+    workspace_shard = workspace.get(st.session_state.class_id)
+    if st.session_state.get('loaded_class_id') != st.session_state.class_id:
+        # Switching classes starts the page over for the new roster
+        for key in ('students_df', 'selected_student', 'loaded_file_id', 'trend_analytics'):
+            st.session_state.pop(key, None)
+        st.session_state.loaded_class_id = st.session_state.class_id
+elif 'data_manager' not in st.session_state:
+    if BEHAVIOR_SHARED_CLASS:
+        class_id = st.query_params.get('class', BEHAVIOR_SHARED_CLASS)
+        # Only configured classes get a store and a place in the resource cache
+        if class_id != BEHAVIOR_SHARED_CLASS and class_id not in SHARED_CLASSES:
+            st.error(f"Unknown class: {class_id}")
+            st.stop()
+        shared = open_shared_class(class_id)
+        st.session_state.data_manager = shared
+        st.session_state.result_cache = shared.result_cache
+    elif BEHAVIOR_DB_PATH:
+        shared = open_stored_class()
+        st.session_state.data_manager = shared
+        st.session_state.result_cache = shared.result_cache
+    else:
+        st.session_state.data_manager = DataManager(tracker=st.session_state.behavior_tracker)
 if 'selected_student' not in st.session_state:
     st.session_state.selected_student = None
 if 'students_df' not in st.session_state: # This will now be derived from data_manager
     st.session_state.students_df = None
-if 'behavior_tracker' not in st.session_state:
-    st.session_state.behavior_tracker = BehaviorTracker()
+    if current_data_manager().has_data():
+        # Data was restored from the durable store
+        st.session_state.students_df = pd.DataFrame({'name': current_data_manager().get_student_list()})
+        st.session_state.selected_student = st.session_state.students_df['name'].iloc[0] if len(st.session_state.students_df) else None
+if isinstance(current_data_manager(), SharedDataManager):
+    # Another session may have loaded a roster or added students since our last run
+    shared_students = current_data_manager().get_student_list()
+    if shared_students and (st.session_state.students_df is None or st.session_state.students_df['name'].tolist() != shared_students):
+        st.session_state.students_df = pd.DataFrame({'name': shared_students})
+        if st.session_state.selected_student not in shared_students:
+            st.session_state.selected_student = shared_students[0]
+if 'trend_analytics' not in st.session_state:
+    st.session_state.trend_analytics = TrendAnalytics(st.session_state.behavior_tracker)
 if 'speed_mode_active' not in st.session_state:
     st.session_state.speed_mode_active = False
+if 'class_overview_active' not in st.session_state:
+    st.session_state.class_overview_active = False
 if 'record_previous_date_active' not in st.session_state:
     st.session_state.record_previous_date_active = False
 if 'persistent_date' not in st.session_state:
@@ -30,158 +172,89 @@ if 'show_export_dialog' not in st.session_state:
     st.session_state.show_export_dialog = False
 if 'show_print_dialog' not in st.session_state:
     st.session_state.show_print_dialog = False
+if not BEHAVIOR_WORKSPACE and 'result_cache' not in st.session_state:
+    st.session_state.result_cache = ResultCache()
 
 
-def generate_excel_report(start_date, end_date):
-    """Generates an Excel report for all students within a date range."""
-    all_data = st.session_state.data_manager.get_all_behavior_data()
-    students_df = st.session_state.students_df
-    if all_data is None or students_df is None or all_data.empty:
-        return None
+def class_today():
+    """Returns today's date in the class time zone."""
+    return datetime.now(CLASS_TIMEZONE).date()
 
-    try:
-        all_data['date'] = pd.to_datetime(all_data['date']).dt.date
-        mask = (all_data['date'] >= start_date) & (all_data['date'] <= end_date)
-        filtered_data = all_data.loc[mask]
-    except Exception as e:
-        st.error(f"Error filtering data: {e}")
-        return None
 
-    if filtered_data.empty:
-        return None
+def read_data_manager():
+    """Returns the data to read a whole report from: a consistent snapshot when
+    the class is shared, since other sessions may write while it renders."""
+    data_manager = current_data_manager()
+    if isinstance(data_manager, SharedDataManager):
+        return data_manager.snapshot()
+    return data_manager
 
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-    worksheet = workbook.add_worksheet("Behavior Report")
 
-    # --- Formatting ---
-    title_format = workbook.add_format({'bold': True, 'font_size': 16, 'align': 'center', 'valign': 'vcenter'})
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'border': 1, 'align': 'center', 'valign': 'vcenter'})
-    cell_format = workbook.add_format({'align': 'center', 'valign': 'vcenter'})
+def download_snapshot():
+    """Returns a copy of the data for the deferred CSV download, taken once per data version.
 
-    # --- Write Titles and Headers ---
-    worksheet.merge_range('A1:E1', 'Behavior Report', title_format)
-    date_range_str = f"Date Range: {start_date.strftime('%m/%d/%Y')} to {end_date.strftime('%m/%d/%Y')}"
-    worksheet.merge_range('A2:E2', date_range_str, workbook.add_format({'align': 'center'}))
+    Shared classes already keep one; a session's own manager gets a
+    column-only copy kept in the session, so idle reruns reuse it and the
+    CSV bytes it caches once downloaded.
+    """
+    data_manager = current_data_manager()
+    if isinstance(data_manager, SharedDataManager):
+        return data_manager.snapshot()
+    snap = st.session_state.get('download_snapshot')
+    if snap is None or snap.get_version() != data_manager.get_version():
+        snap = data_manager.snapshot(build_views=False)
+        st.session_state.download_snapshot = snap
+    return snap
 
-    headers = ["Student Name", "Good Points", "Bad Points", "Good Behavior %", "Days Recorded"]
-    worksheet.write_row('A4', headers, header_format)
-    worksheet.set_column('A:A', 20)
-    worksheet.set_column('B:E', 15)
 
-    # --- Write Data for Each Student ---
-    row_num = 4
-    for student_name in students_df['name']:
-        student_data = filtered_data[filtered_data['student'] == student_name]
+def read_trends():
+    """Returns the trend analytics, brought up to date with any writes since the last run."""
+    return st.session_state.trend_analytics.update(read_data_manager())
 
-        worksheet.write(row_num, 0, student_name, cell_format)
 
-        if student_data.empty:
-            worksheet.merge_range(row_num, 1, row_num, 4, "No data for this period", cell_format)
-            row_num += 1
-            continue
+@profiling.timed
+def generate_excel_report(start_date, end_date, include_entries=False):
+    """Writes an Excel report for all students within a date range to a temp file; returns its path.
 
-        points_summary = st.session_state.behavior_tracker.calculate_points_summary(student_data)
-        
-        worksheet.write(row_num, 1, points_summary['total_good_points'], cell_format)
-        worksheet.write(row_num, 2, points_summary['total_bad_points'], cell_format)
-        worksheet.write(row_num, 3, f"{points_summary['good_percentage']}%", cell_format)
-        worksheet.write(row_num, 4, points_summary['days_recorded'], cell_format)
+    Not cached: the workbook can run to megabytes and is only downloaded
+    once, straight from the file.
+    """
+    students_df = st.session_state.students_df
+    if students_df is None:
+        return None
 
-        row_num += 1
+    try:
+        return reports.excel_report_file(read_data_manager(), st.session_state.behavior_tracker, students_df['name'].tolist(),
+                                         start_date, end_date, include_entries)
+    except Exception as e:
+        st.error(f"Error generating report: {e}")
+        return None
 
-    workbook.close()
-    return output.getvalue()
 
+def discard_report_file():
+    """Removes the Excel report waiting to be downloaded, if any.
 
-def generate_printable_html(student_list):
-    """Generates a rich, interactive HTML report that opens in a new tab."""
-    
-    all_student_html = ""
-    for student_name in student_list:
-        student_data = st.session_state.data_manager.get_student_behavior_data(student_name)
-        
-        pie_chart_html = "<h4>Behavior Distribution</h4><p>No data to display.</p>"
-        bar_chart_html = "<h4>Behavior Percentages</h4><p>No data to display.</p>"
-        timeline_html = "<h4>Recent Behavior</h4><p>No data to display.</p>"
-
-        if not student_data.empty:
-            colors = st.session_state.behavior_tracker.get_color_options()
-            color_names = list(colors.keys())
-            color_counts = student_data['color'].value_counts()
-            total_entries = len(student_data)
-            percentages = {color: (color_counts.get(color, 0) / total_entries) * 100 for color in color_names}
-
-            # --- Generate Pie Chart ---
-            fig_pie = px.pie(values=list(percentages.values()), names=color_names, color=color_names, color_discrete_map=colors)
-            fig_pie.update_layout(showlegend=False, width=300, height=300, margin=dict(l=10, r=10, t=10, b=10))
-            fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-            pie_chart_html = f"<h4>Behavior Distribution</h4>{fig_pie.to_html(full_html=False, include_plotlyjs='cdn')}"
-
-            # --- Generate Bar Chart ---
-            fig_bar = px.bar(x=color_names, y=[percentages[c] for c in color_names], color=color_names, color_discrete_map=colors)
-            fig_bar.update_layout(showlegend=False, width=300, height=300, margin=dict(l=10, r=10, t=10, b=10), yaxis_title="Percentage (%)")
-            bar_chart_html = f"<h4>Behavior Percentages</h4>{fig_bar.to_html(full_html=False, include_plotlyjs='cdn')}"
-
-            # --- Generate Timeline Chart ---
-            recent_data = student_data.sort_values('date', ascending=False).head(10)
-            fig_timeline = go.Figure()
-            if not recent_data.empty:
-                min_date = recent_data['date'].min()
-                for color in color_names:
-                    fig_timeline.add_trace(go.Scatter(x=[min_date], y=[color], mode='markers', marker=dict(size=0, opacity=0), showlegend=False))
-                for _, row in recent_data.iterrows():
-                    fig_timeline.add_trace(go.Scatter(x=[row['date']], y=[row['color']], mode='markers', marker=dict(size=15, color=colors[row['color']], line=dict(width=2, color='black')), name=row['color'], showlegend=False))
-            fig_timeline.update_layout(width=650, height=300, margin=dict(l=10, r=10, t=10, b=10), yaxis=dict(categoryorder='array', categoryarray=color_names), xaxis_title="Date")
-            timeline_html = f"<h4>Recent Behavior Timeline</h4>{fig_timeline.to_html(full_html=False, include_plotlyjs='cdn')}"
-
-        points_summary = st.session_state.behavior_tracker.calculate_points_summary(student_data)
-        
-        all_student_html += f"""
-        <div class="student-report">
-            <h2>{student_name}</h2>
-            <div class="top-row">
-                <div class="summary-table">
-                    <h4>Point System Summary</h4>
-                    <table>
-                        <tr><th>Category</th><th>Value</th></tr>
-                        <tr><td>Good Points</td><td>{points_summary['total_good_points']}</td></tr>
-                        <tr><td>Bad Points</td><td>{points_summary['total_bad_points']}</td></tr>
-                        <tr><td>Good Behavior %</td><td>{points_summary['good_percentage']}%</td></tr>
-                        <tr><td>Days Recorded</td><td>{points_summary['days_recorded']}</td></tr>
-                    </table>
-                </div>
-                <div class="chart-cell">{pie_chart_html}</div>
-            </div>
-            <div class="bottom-row">
-                <div class="chart-cell">{bar_chart_html}</div>
-                <div class="chart-cell timeline">{timeline_html}</div>
-            </div>
-        </div>
-        """
-
-    full_html = f"""
-    <html><head><title>Behavior Report</title><style>
-        @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;600&display=swap');
-        body {{ font-family: 'Poppins', sans-serif; padding: 20px; }}
-        .student-report {{ page-break-inside: avoid; border: 1px solid #ccc; border-radius: 10px; padding: 15px; margin-bottom: 20px; }}
-        h1 {{ text-align: center; }} h2 {{ border-bottom: 2px solid #eee; padding-bottom: 5px; }} h4 {{ text-align: center; margin-top: 0; }}
-        .top-row, .bottom-row {{ display: flex; align-items: center; justify-content: space-around; margin-bottom: 15px; }}
-        .summary-table, .chart-cell {{ flex: 1; padding: 10px; text-align: center; }}
-        .chart-cell.timeline {{ flex: 2; }}
-        table {{ width: 100%; border-collapse: collapse; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-        th {{ background-color: #f2f2f2; }}
-    </style></head><body>
-        <h1>Behavior Report</h1>
-        {all_student_html}
-    </body></html>
+    A report the session never discards is removed once the session is
+    gone (see reports.ReportFile).
     """
-    return full_html
+    report = st.session_state.pop('report_to_download', None)
+    if report is not None:
+        report.discard()
+
+
+@profiling.timed
+def generate_printable_html(student_list, style='interactive'):
+    """Generates an HTML report for the given students.
+
+    style='interactive' embeds Plotly charts; style='static' draws them as
+    small inline SVGs, which keeps class-wide reports light.
+    """
+    return reports.printable_report_html(read_data_manager(), st.session_state.behavior_tracker, student_list,
+                                         style=style, cache=current_result_cache())
 
 
 def main():
-    st.set_page_config(page_title="Mrs. Joyner's Class",
+    st.set_page_config(page_title=class_title(),
                        page_icon="📚",
                        layout="wide",
                        initial_sidebar_state="expanded")
@@ -232,6 +305,8 @@ def main():
     st.markdown(style_css, unsafe_allow_html=True)
 
     # --- SIDEBAR ---
+    if BEHAVIOR_WORKSPACE:
+        display_class_picker()
     st.sidebar.header("Class Data")
     uploaded_file = st.sidebar.file_uploader(
         "Upload Roster or Data File",
@@ -240,44 +315,76 @@ def main():
     if uploaded_file is not None:
         # Load data only once when a new file is uploaded
         if 'loaded_file_id' not in st.session_state or st.session_state.loaded_file_id != uploaded_file.id:
-            success, message = st.session_state.data_manager.load_data_from_file(uploaded_file)
+            success, message = current_data_manager().load_data_from_file(uploaded_file)
             if success:
-                st.session_state.students_df = pd.DataFrame({'name': st.session_state.data_manager.get_student_list()})
+                st.session_state.students_df = pd.DataFrame({'name': current_data_manager().get_student_list()})
                 st.session_state.selected_student = st.session_state.students_df['name'].iloc[0]
                 st.session_state.loaded_file_id = uploaded_file.id
                 st.sidebar.success(message)
+                if current_data_manager().last_load_issues:
+                    with st.sidebar.expander("Rows that were skipped"):
+                        st.write("\n".join(f"- {issue}" for issue in current_data_manager().last_load_issues))
             else:
                 st.sidebar.error(message)
                 st.stop()
     
+    with st.sidebar.expander("Merge Data Files"):
+        merge_files = st.file_uploader("Files to combine with the current data", type=['csv', 'xlsx', 'xls'],
+                                       accept_multiple_files=True, key="merge_files")
+        policy = st.radio("When files disagree", list(MERGE_POLICY_LABELS), format_func=MERGE_POLICY_LABELS.get, key="merge_policy")
+        if st.button("Merge Files", disabled=not merge_files):
+            success, message = current_data_manager().merge_data_from_files(merge_files, policy)
+            if success:
+                st.session_state.students_df = pd.DataFrame({'name': current_data_manager().get_student_list()})
+                if st.session_state.selected_student not in st.session_state.students_df['name'].tolist():
+                    st.session_state.selected_student = st.session_state.students_df['name'].iloc[0]
+                st.success(message)
+                conflicts = current_data_manager().last_merge_conflicts
+                if conflicts is not None and not conflicts.empty:
+                    st.caption("Conflicting entries")
+                    st.dataframe(conflicts, hide_index=True)
+                if current_data_manager().last_load_issues:
+                    st.caption("Rows that were skipped")
+                    st.write("\n".join(f"- {issue}" for issue in current_data_manager().last_load_issues))
+            else:
+                st.error(message)
+
     # --- SAVE & DOWNLOAD BUTTON ---
-    if st.session_state.data_manager.behavior_data is not None:
+    if current_data_manager().has_data():
         st.sidebar.markdown("---")
         st.sidebar.header("Save Session Data")
         
-        download_data = st.session_state.data_manager.get_data_for_download()
-        
-        if download_data:
-            # Generate a dynamic filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            st.sidebar.download_button(
-                label="Save & Download Data",
-                data=download_data,
-                file_name=f"behavior_data_{timestamp}.csv",
-                mime="text/csv",
-                help="Download all current data to a new CSV file. Upload this file next time to continue."
-            )
+        # Generate a dynamic filename
+        timestamp = datetime.now(CLASS_TIMEZONE).strftime("%Y%m%d_%H%M%S")
+        # Passing the method rather than its result defers building the CSV
+        # until the button is clicked, so ordinary reruns skip it. It then runs
+        # on another thread, so it reads a copy that later writes cannot touch
+        st.sidebar.download_button(
+            label="Save & Download Data",
+            data=download_snapshot().get_data_for_download,
+            file_name=f"behavior_data_{timestamp}.csv",
+            mime="text/csv",
+            help="Download all current data to a new CSV file. Upload this file next time to continue."
+        )
+        if current_data_manager().can_undo():
+            if st.sidebar.button("Undo Last Change", use_container_width=True):
+                if current_data_manager().undo_last_change():
+                    st.rerun()
+                st.sidebar.info("Nothing to undo.")
+
+    if profiling.ENABLED:
+        display_performance_panel()
 
     # --- MAIN APP ---
     # Show header only if data is loaded
-    if st.session_state.data_manager.behavior_data is not None:
+    if current_data_manager().has_data():
         color_boxes_html = "".join([
             f'<div class="color-box" style="background-color: {hex_code};"></div>'
             for hex_code in colors.values()
         ])
         st.markdown(f"""
             <div class="stripe-banner">
-                <div class="stripe-title">Mrs. Joyner's Class</div>
+                <div class="stripe-title">{class_title()}</div>
                 <div class="color-stripe">
                     {color_boxes_html}
                 </div>
@@ -286,28 +393,62 @@ def main():
 
         # Speed Entry Button
         st.markdown("<div style='margin-top: 10px;'></div>", unsafe_allow_html=True)
-        _, col_btn = st.columns([0.8, 0.2])
+        _, col_overview, col_btn = st.columns([0.6, 0.2, 0.2])
         with col_btn:
-            if st.session_state.speed_mode_active:
+            if st.session_state.speed_mode_active or st.session_state.class_overview_active:
                 if st.button("Back to Home Page", use_container_width=True, type="primary"):
                     st.session_state.speed_mode_active = False
+                    st.session_state.class_overview_active = False
                     st.rerun()
             else:
                 if st.button("Enter Today's Data", use_container_width=True, type="primary"):
                     st.session_state.speed_entry_index = 0
                     st.session_state.speed_mode_active = True
                     st.rerun()
+        with col_overview:
+            if not st.session_state.speed_mode_active and not st.session_state.class_overview_active:
+                if st.button("Class Overview", use_container_width=True):
+                    st.session_state.class_overview_active = True
+                    st.rerun()
     
     # --- RENDER MAIN CONTENT ---
-    if st.session_state.data_manager.behavior_data is None:
+    if not current_data_manager().has_data():
         st.info("Welcome! Please upload a class roster or a previously saved data file to begin.")
         st.stop()
     
     if st.session_state.get('speed_mode_active', False):
         # --- SPEED MODE VIEW ---
-        from zoneinfo import ZoneInfo
         students = st.session_state.students_df['name'].tolist()
         
+        current_date = class_today()
+        date_str = current_date.strftime("%Y-%m-%d")
+        date_display = current_date.strftime("%m/%d/%Y")
+
+        entry_style = st.radio("Entry style", ["One student at a time", "Whole class at once"],
+                               key="speed_entry_style", horizontal=True)
+
+        if entry_style == "Whole class at once":
+            # One form for the class: choices stay client-side until submit,
+            # then every entry is written in a single batch and one rerun
+            st.subheader("Log behavior for the whole class")
+            st.markdown(f"**Recording for:** {date_display}")
+            no_entry = "—"
+            with st.form("speed_class_form"):
+                for student in students:
+                    st.radio(student, [no_entry] + list(colors.keys()), key=f"speed_class_{student}", horizontal=True)
+                submitted = st.form_submit_button("Save Class Entries", type="primary")
+
+            if submitted:
+                entries = [(student, st.session_state[f"speed_class_{student}"], date_str)
+                           for student in students
+                           if st.session_state.get(f"speed_class_{student}", no_entry) != no_entry]
+                if entries:
+                    saved = current_data_manager().add_behavior_entries(entries)
+                    st.success(f"Saved {saved} entr{'y' if saved == 1 else 'ies'} for {date_display}.")
+                else:
+                    st.warning("Select a color for at least one student before saving.")
+            st.stop()
+
         if "speed_entry_index" not in st.session_state:
             st.session_state.speed_entry_index = 0
 
@@ -320,17 +461,13 @@ def main():
 
         current_student = students[st.session_state.speed_entry_index]
         st.subheader(f"Log behavior for: {current_student}")
-
-        current_date = datetime.now(ZoneInfo("America/Chicago")).date()
-        date_str = current_date.strftime("%Y-%m-%d")
-        date_display = current_date.strftime("%m/%d/%Y")
         st.markdown(f"**Recording for:** {date_display}")
 
         cols = st.columns(len(colors))
         for i, color in enumerate(colors.keys()):
             with cols[i]:
                 if st.button(color, key=f"speed_color_{color}_{current_student}", use_container_width=True):
-                    st.session_state.data_manager.add_behavior_entry(current_student, color, date_str)
+                    current_data_manager().add_behavior_entry(current_student, color, date_str)
                     st.session_state.speed_entry_index += 1
                     st.rerun()
 
@@ -338,6 +475,9 @@ def main():
         if st.button("Skip Student"):
             st.session_state.speed_entry_index += 1
             st.rerun()
+    elif st.session_state.class_overview_active:
+        # --- CLASS OVERVIEW VIEW ---
+        display_class_overview()
     else:
         # --- DASHBOARD VIEW ---
         col1, spacer, col2 = st.columns([1, 0.2, 3])
@@ -354,6 +494,7 @@ def main():
                 st.info("👈 Select a student to view their data.")
 
 
+@profiling.timed
 def display_student_details(student_name):
     st.header(f"{student_name}")
 
@@ -363,8 +504,7 @@ def display_student_details(student_name):
     colors = st.session_state.behavior_tracker.get_color_options()
     color_names = list(colors.keys())
 
-    chicago_tz = pytz.timezone('America/Chicago')
-    current_date_chicago = datetime.now(chicago_tz).date()
+    current_date_chicago = class_today()
 
     if st.session_state.persistent_date is None:
         st.session_state.persistent_date = current_date_chicago
@@ -384,49 +524,51 @@ def display_student_details(student_name):
     date_display = selected_date.strftime("%m/%d/%Y")
     st.write(f"**Recording for:** {date_display}")
 
-    cols = st.columns(7)
+    cols = st.columns(len(color_names))
     for i, color in enumerate(color_names):
         with cols[i]:
             if st.button(color, key=f"color_{color}_{student_name}", use_container_width=True):
-                st.session_state.data_manager.add_behavior_entry(student_name, color, selected_date.strftime("%Y-%m-%d"))
+                current_data_manager().add_behavior_entry(student_name, color, selected_date.strftime("%Y-%m-%d"))
                 st.rerun()
 
-    student_data = st.session_state.data_manager.get_student_behavior_data(student_name)
+    data_manager = current_data_manager()
+
+    if data_manager.get_days_recorded(student_name) > 0:
+        # Figures are rebuilt only when this student's data has changed
+        key = ResultCache.key('dashboard_figures', student_name, version=data_manager.get_student_version(student_name))
+        fig_pie, fig_bar = current_result_cache().get_or_create(key, lambda: build_dashboard_figures(student_name))
 
-    if not student_data.empty:
         st.markdown("<br>", unsafe_allow_html=True)
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Behavior Distribution")
-            fig_pie = px.pie(student_data, values=student_data['color'].value_counts().values, names=student_data['color'].value_counts().index, color=student_data['color'].value_counts().index, color_discrete_map=colors)
-            fig_pie.update_traces(textposition='inside', textinfo='percent+label')
             st.plotly_chart(fig_pie, use_container_width=True)
         with col2:
             st.subheader("Behavior Percentages")
-            percentages = student_data['color'].value_counts(normalize=True) * 100
-            fig_bar = px.bar(percentages, x=percentages.index, y=percentages.values, color=percentages.index, color_discrete_map=colors, labels={'x': 'Behavior Color', 'y': 'Percentage (%)'})
-            fig_bar.update_layout(showlegend=False)
             st.plotly_chart(fig_bar, use_container_width=True)
 
         st.subheader("Point System Distribution")
-        points_summary = st.session_state.behavior_tracker.calculate_points_summary(student_data)
+        points_summary = data_manager.get_points_summary(student_name)
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("Good Points", points_summary['total_good_points'])
         c2.metric("Bad Points", points_summary['total_bad_points'])
         c3.metric("Good Behavior %", f"{points_summary['good_percentage']}%")
         c4.metric("Days Recorded", points_summary['days_recorded'])
 
+        trends = read_trends().summary().loc[student_name]
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Last 7 Days", format_percentage(trends['good_pct_7d']),
+                  delta=None if pd.isna(trends['week_over_week']) else f"{trends['week_over_week']:+.1f} pts vs last week")
+        c2.metric("Last 30 Days", format_percentage(trends['good_pct_30d']))
+        c3.metric("Green-or-Better Streak", int(trends['current_streak']))
+        c4.metric("Longest Streak", int(trends['longest_streak']))
+
         st.write("")
         st.subheader("Recent Behavior Timeline")
-        recent_data = student_data.sort_values('date', ascending=False).head(10)
-        if not recent_data.empty:
-            fig_timeline = go.Figure()
-            for color in color_names:
-                fig_timeline.add_trace(go.Scatter(x=recent_data['date'], y=[color]*len(recent_data), mode='markers', marker=dict(size=0, opacity=0), showlegend=False))
-            for _, row in recent_data.iterrows():
-                fig_timeline.add_trace(go.Scatter(x=[row['date']], y=[row['color']], mode='markers', marker=dict(size=15, color=colors[row['color']], line=dict(width=2, color='black')), name=row['color'], showlegend=False))
-            fig_timeline.update_layout(xaxis_title="Date", yaxis_title="Behavior Color", xaxis=dict(tickformat='%m/%d'), yaxis=dict(categoryorder='array', categoryarray=color_names))
-            st.plotly_chart(fig_timeline, use_container_width=True)
+        window = st.selectbox("Entries shown", TIMELINE_WINDOWS, key="timeline_window", format_func=lambda n: f"Last {n} entries")
+        key = ResultCache.key(f'dashboard_timeline_{window}', student_name, version=data_manager.get_student_version(student_name))
+        fig_timeline = current_result_cache().get_or_create(key, lambda: build_dashboard_timeline(student_name, window))
+        st.plotly_chart(fig_timeline, use_container_width=True)
 
         # --- ACTION BUTTONS ---
         st.write("")
@@ -450,25 +592,178 @@ def display_student_details(student_name):
         st.info("No behavior data recorded for this student yet.")
 
 
+@profiling.timed
+def build_dashboard_figures(student_name):
+    """Builds the (pie, bar) figures shown on a student's dashboard."""
+    # Plotly is only loaded once a dashboard is first shown
+    import plotly.express as px
+
+    data_manager = current_data_manager()
+    colors = st.session_state.behavior_tracker.get_color_options()
+
+    color_counts = data_manager.get_color_counts(student_name)
+    color_counts = color_counts[color_counts > 0].sort_values(ascending=False, kind='stable')
+    fig_pie = px.pie(values=color_counts.values, names=color_counts.index, color=color_counts.index, color_discrete_map=colors)
+    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+
+    percentages = color_counts / color_counts.sum() * 100
+    fig_bar = px.bar(percentages, x=percentages.index, y=percentages.values, color=percentages.index, color_discrete_map=colors, labels={'x': 'Behavior Color', 'y': 'Percentage (%)'})
+    fig_bar.update_layout(showlegend=False)
+
+    return fig_pie, fig_bar
+
+
+@profiling.timed
+def build_dashboard_timeline(student_name, window=reports.RECENT_ENTRIES):
+    """Builds the timeline of a student's last `window` entries."""
+    student_data = current_data_manager().get_student_behavior_data(student_name)
+    recent_data = student_data.sort_values('date', ascending=False).head(window)
+    fig_timeline = reports.timeline_figure(recent_data['date'], recent_data['color'].astype(str), st.session_state.behavior_tracker.get_color_options())
+    fig_timeline.update_layout(yaxis_title="Behavior Color", xaxis=dict(tickformat='%m/%d'))
+    return fig_timeline
+
+
+def display_class_overview():
+    """Shows the whole class at once: a students x dates heatmap and a points table."""
+    st.header("Class Overview")
+    period = st.selectbox("Period", list(OVERVIEW_PERIODS), key="overview_period")
+    days = OVERVIEW_PERIODS[period]
+    start_date = class_today() - pd.Timedelta(days=days - 1) if days else None
+
+    # Built once per data version and period, however often the page reruns
+    data_manager = current_data_manager()
+    key = ResultCache.key('class_overview', date_range=(start_date, None), version=data_manager.get_version())
+    fig_heatmap, points_table = current_result_cache().get_or_create(key, lambda: build_class_overview(start_date))
+
+    if fig_heatmap is None:
+        st.info("No behavior data recorded in this period.")
+        return
+    st.plotly_chart(fig_heatmap, use_container_width=True)
+
+    st.subheader("Points")
+    st.caption("Click a column header to sort.")
+    st.dataframe(points_table, use_container_width=True)
+
+    st.subheader("Trending Down")
+    trending_down = read_trends().trending_down()
+    if trending_down.empty:
+        st.caption("No student's good behavior % fell from last week.")
+    else:
+        st.caption("Good behavior % this week compared with last week, as of the latest recorded day.")
+        st.dataframe(trending_down[['this_week_pct', 'last_week_pct', 'week_over_week', 'good_pct_30d', 'current_streak']].rename(columns={
+            'this_week_pct': "This Week %", 'last_week_pct': "Last Week %", 'week_over_week': "Change (pts)",
+            'good_pct_30d': "Last 30 Days %", 'current_streak': "Current Streak"}).rename_axis("Student"), use_container_width=True)
+
+
+@profiling.timed
+def build_class_overview(start_date=None):
+    """Builds the class heatmap figure (None if there are no entries) and points table from start_date on."""
+    data_manager = read_data_manager()
+    tracker = st.session_state.behavior_tracker
+    color_matrix = data_manager.get_color_matrix(start_date)
+    fig_heatmap = reports.class_heatmap_figure(color_matrix, tracker.get_color_options()) if len(color_matrix.columns) else None
+
+    points_table = tracker.summarize_points(data_manager.get_range(start_date)).reindex(color_matrix.index, fill_value=0)
+    points_table = points_table.rename(columns={
+        'total_good_points': "Good Points", 'total_bad_points': "Bad Points", 'total_points': "Total Points",
+        'good_percentage': "Good Behavior %", 'days_recorded': "Days Recorded"})
+    points_table.index.name = "Student"
+    return fig_heatmap, points_table
+
+
+def format_percentage(value):
+    """Formats a percentage for display, with a dash when there is no data."""
+    return "—" if pd.isna(value) else f"{value}%"
+
+
+def class_title():
+    """Returns the name shown in the page title and banner."""
+    return st.session_state.class_id if BEHAVIOR_WORKSPACE else "Mrs. Joyner's Class"
+
+
+def display_class_picker():
+    """Sidebar controls to switch between, add, and compare the workspace's classes."""
+    workspace = open_workspace()
+    class_ids = workspace.class_ids()
+    if st.session_state.class_id not in class_ids:
+        class_ids.append(st.session_state.class_id)
+    st.sidebar.header("Class")
+    chosen = st.sidebar.selectbox("Class", class_ids, index=class_ids.index(st.session_state.class_id), label_visibility="collapsed")
+    if chosen != st.session_state.class_id:
+        st.session_state.class_id = chosen
+        st.rerun()
+
+    with st.sidebar.expander("Add a class"):
+        new_class = st.text_input("Class name", key="new_class_name").strip()
+        if st.button("Add Class", disabled=not new_class):
+            try:
+                workspace.get(new_class)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.session_state.class_id = new_class
+                st.rerun()
+
+    with st.sidebar.expander("School-wide trend"):
+        if st.button("Compare all classes"):
+            st.session_state.school_weekly = workspace.weekly_good_percentage()
+        weekly = st.session_state.get('school_weekly')
+        if weekly is not None:
+            if weekly.empty:
+                st.info("No behavior data recorded yet.")
+            else:
+                st.caption("Good behavior % by week, all classes")
+                st.line_chart(weekly['good_percentage'])
+
+
+def display_performance_panel():
+    """Sidebar panel with timing percentiles per span and the previous rerun's breakdown."""
+    with st.sidebar.expander("Performance"):
+        summary = profiling.recorder.summary()
+        if not summary:
+            st.caption("No timings recorded yet.")
+            return
+        st.markdown("**Per span (ms)**")
+        st.dataframe(pd.DataFrame(summary).set_index('span').round(2), use_container_width=True)
+
+        last_rerun = st.session_state.get('last_rerun_spans', [])
+        if last_rerun:
+            st.markdown(f"**Last rerun** ({sum(seconds for name, seconds in last_rerun if name == 'rerun') * 1000:.1f} ms)")
+            breakdown = pd.DataFrame(last_rerun, columns=['span', 'seconds'])
+            breakdown = breakdown.groupby('span', sort=False)['seconds'].agg(['count', 'sum'])
+            breakdown['ms'] = (breakdown.pop('sum') * 1000).round(2)
+            st.dataframe(breakdown.sort_values('ms', ascending=False), use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Timings JSON", data=profiling.recorder.to_json, file_name="timings.json", mime="application/json")
+        with col2:
+            st.download_button("Chrome Trace", data=profiling.recorder.to_chrome_trace, file_name="trace.json", mime="application/json")
+
+
 def handle_dialogs(student_name):
-    chicago_tz = pytz.timezone('America/Chicago')
     # --- PRINT DIALOG ---
     if st.session_state.show_print_dialog:
         with st.form("print_form"):
             st.markdown("---")
             st.markdown("#### Print Behavior Report")
             print_option = st.radio("Select which students to print:", (f"Only {student_name}", "All Students"), key="print_radio")
-            submitted = st.form_submit_button("Generate & Open Report")
+            style_option = st.radio("Chart style:", ("Static charts (small file, prints fast)", "Interactive charts"), key="print_style_radio")
+            submitted = st.form_submit_button("Generate Report")
             if submitted:
                 student_list = [student_name] if print_option == f"Only {student_name}" else st.session_state.students_df['name'].tolist()
+                style = 'interactive' if style_option == "Interactive charts" else 'static'
                 with st.spinner("Generating report..."):
-                    report_html = generate_printable_html(student_list)
-                    b64_html = base64.b64encode(report_html.encode()).decode()
-                    link = f'<a href="data:text/html;base64,{b64_html}" target="_blank" style="display: inline-block; padding: 10px 20px; background-color: #007bff; color: white; text-decoration: none; border-radius: 5px;">Click Here to Open Printable Report in New Tab</a>'
-                    st.markdown(link, unsafe_allow_html=True)
-                    st.success("Your report is ready!")
+                    report_html = generate_printable_html(student_list, style=style)
+                    report_name = student_name if len(student_list) == 1 else "all_students"
+                    st.session_state.print_report_to_download = {"data": report_html.encode('utf-8'), "name": f"behavior_report_{report_name}.html"}
+                    st.success("Your report is ready! Download it and open it in your browser to print.")
+        if 'print_report_to_download' in st.session_state:
+            st.download_button(label="Click to Download Printable Report", data=st.session_state.print_report_to_download['data'], file_name=st.session_state.print_report_to_download['name'], mime="text/html")
         if st.button("Close Print View"):
             st.session_state.show_print_dialog = False
+            if 'print_report_to_download' in st.session_state:
+                del st.session_state.print_report_to_download
             st.rerun()
 
     # --- EXPORT DIALOG ---
@@ -476,9 +771,10 @@ def handle_dialogs(student_name):
         with st.form("export_form"):
             st.markdown("---")
             st.markdown("#### Export Class Report")
-            today = datetime.now(chicago_tz).date()
+            today = class_today()
             default_start = today - pd.Timedelta(days=30)
             date_range = st.date_input("Select date range for report:", value=(default_start, today), max_value=today, format="MM/DD/YYYY")
+            include_entries = st.checkbox("Include a sheet with every daily entry", key="export_include_entries")
             submitted = st.form_submit_button("Generate Report File")
             if submitted:
                 if len(date_range) == 2:
@@ -487,19 +783,20 @@ def handle_dialogs(student_name):
                         st.error("Error: Start date cannot be after end date.")
                     else:
                         with st.spinner("Generating report..."):
-                            report_bytes = generate_excel_report(start_date, end_date)
-                            if report_bytes:
-                                st.session_state.report_to_download = {"data": report_bytes, "name": f"behavior_report_{start_date.strftime('%Y-%m-%d')}_to_{end_date.strftime('%Y-%m-%d')}.xlsx"}
+                            discard_report_file()
+                            report_path = generate_excel_report(start_date, end_date, include_entries)
+                            if report_path:
+                                st.session_state.report_to_download = reports.ReportFile(report_path, f"behavior_report_{start_date.strftime('%Y-%m-%d')}_to_{end_date.strftime('%Y-%m-%d')}.xlsx")
                             else:
                                 st.warning("No data found in the selected date range.")
                 else:
                     st.warning("Please select a valid date range.")
         if 'report_to_download' in st.session_state:
-            st.download_button(label="Click to Download Report", data=st.session_state.report_to_download['data'], file_name=st.session_state.report_to_download['name'], mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            with open(st.session_state.report_to_download.path, 'rb') as report_file:
+                st.download_button(label="Click to Download Report", data=report_file, file_name=st.session_state.report_to_download.name, mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         if st.button("Close Export View"):
             st.session_state.show_export_dialog = False
-            if 'report_to_download' in st.session_state:
-                del st.session_state.report_to_download
+            discard_report_file()
             st.rerun()
 
     # --- CLEAR DATA DIALOG ---
@@ -513,12 +810,12 @@ def handle_dialogs(student_name):
             if c1.button("Clear Data", type="primary", key=f"confirm_clear_{student_name}"):
                 if password == "MRSJOYNER":
                     if clear_option == f"Only {student_name}":
-                        if st.session_state.data_manager.clear_student_data(student_name):
+                        if current_data_manager().clear_student_data(student_name):
                             st.success(f"All behavior data cleared for {student_name}")
                             st.session_state[f'show_clear_dialog_{student_name}'] = False
                             st.rerun()
                     else:
-                        if st.session_state.data_manager.clear_all_data():
+                        if current_data_manager().clear_all_data():
                             st.success("All behavior data cleared for all students")
                             st.session_state[f'show_clear_dialog_{student_name}'] = False
                             st.rerun()
@@ -529,4 +826,5 @@ def handle_dialogs(student_name):
                 st.rerun()
 
 if __name__ == "__main__":
-    main()
+    with profiling.span('rerun'):
+        main()
@@ -0,0 +1,142 @@
+"""Headless batch reports for many classes at once.
+
+Reads every class data file (.csv, .xlsx or .xls, as saved from the app) in
+a directory and writes each class's Excel report and/or printable HTML
+report to an output directory, one class per worker process:
+
+    python batch_reports.py term_data/ --output reports/
+    python batch_reports.py term_data/ --output reports/ --start 2024-01-08 --end 2024-05-24 --format xlsx
+
+Reports are named after their data file (`room_12.csv` gives
+`room_12.xlsx` and `room_12.html`). The Excel report covers --start to
+--end, defaulting to each class's first and last recorded day; the
+printable report covers every entry, as in the app. No Streamlit server is
+needed: this calls the same reports.py functions the app does. Exits with
+status 1 if any class fails.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import reports
+from behavior_tracker import BehaviorTracker
+from color_scheme import ColorScheme
+from data_manager import DataManager
+
+DATA_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+FORMATS = ('xlsx', 'html')
+
+
+def find_class_files(data_dir):
+    """Returns the class data files in data_dir, sorted by name."""
+    return sorted(os.path.join(data_dir, name) for name in os.listdir(data_dir)
+                  if name.lower().endswith(DATA_EXTENSIONS) and not name.startswith(('.', '~$')))
+
+
+def load_class(path, tracker):
+    """Loads one class data file into a new DataManager; raises ValueError if it cannot be read."""
+    data_manager = DataManager(tracker=tracker)
+    with open(path, 'rb') as f:
+        success, message = data_manager.load_data_from_file(f)
+    if not success:
+        raise ValueError(message)
+    return data_manager
+
+
+def report_class(path, output_dir, formats=FORMATS, start_date=None, end_date=None, style='static',
+                 include_entries=False, scheme_path=None, section_executor=None):
+    """Writes the reports for one class data file and returns the paths written.
+
+    Runs in a worker process, so it takes and returns only plain values.
+    """
+    tracker = BehaviorTracker(ColorScheme.from_json(scheme_path) if scheme_path else None)
+    data_manager = load_class(path, tracker)
+    students = data_manager.get_student_list()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    written = []
+
+    if 'xlsx' in formats:
+        entries = data_manager.get_range()
+        if not entries.empty:
+            first_day, last_day = entries['date'].iloc[0].date(), entries['date'].iloc[-1].date()
+            xlsx_path = os.path.join(output_dir, f"{stem}.xlsx")
+            if reports.stream_excel_report(data_manager, tracker, students, start_date or first_day, end_date or last_day,
+                                           include_entries, path=xlsx_path) is not None:
+                written.append(xlsx_path)
+
+    if 'html' in formats:
+        html_path = os.path.join(output_dir, f"{stem}.html")
+        html = reports.printable_report_html(data_manager, tracker, students, style=style, executor=section_executor)
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        written.append(html_path)
+    return written
+
+
+def run_batch(paths, output_dir, workers=None, **options):
+    """Reports every class in paths, one class per worker process.
+
+    Yields (path, written paths, error message or None) as classes finish,
+    in input order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) <= 1:
+        # In-process, so the printable report may use its own section pool
+        for path in paths:
+            try:
+                yield path, report_class(path, output_dir, **options), None
+            except Exception as e:
+                yield path, [], str(e)
+        return
+
+    # Each class is rendered serially inside its worker rather than nesting pools
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(report_class, path, output_dir, section_executor='serial', **options) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, [], str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write behavior reports for every class data file in a directory.")
+    parser.add_argument('data_dir', help="directory of class data files (.csv, .xlsx, .xls)")
+    parser.add_argument('--output', '-o', default='reports', help="directory to write reports to (default: reports)")
+    parser.add_argument('--format', choices=FORMATS, action='append', dest='formats',
+                        help="report to write; repeat for both (default: both)")
+    parser.add_argument('--start', type=date.fromisoformat, help="first day of the Excel report (YYYY-MM-DD)")
+    parser.add_argument('--end', type=date.fromisoformat, help="last day of the Excel report (YYYY-MM-DD)")
+    parser.add_argument('--include-entries', action='store_true', help="add a sheet of every daily entry to the Excel report")
+    parser.add_argument('--style', choices=sorted(reports.REPORT_STYLES), default='static',
+                        help="printable report charts: static SVG or interactive Plotly (default: static)")
+    parser.add_argument('--color-scheme', help="JSON file with a custom color scheme (see color_scheme.py)")
+    parser.add_argument('--workers', type=int, help="classes to report at once (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    paths = find_class_files(args.data_dir)
+    if not paths:
+        print(f"No class data files found in {args.data_dir}")
+        return 1
+
+    failures = 0
+    results = run_batch(paths, args.output, args.workers, formats=tuple(args.formats or FORMATS),
+                        start_date=args.start, end_date=args.end, style=args.style,
+                        include_entries=args.include_entries, scheme_path=args.color_scheme)
+    for path, written, error in results:
+        if error is not None:
+            failures += 1
+            print(f"FAIL: {os.path.basename(path)}: {error}")
+        elif not written:
+            print(f"{os.path.basename(path)}: no data to report")
+        else:
+            print(f"{os.path.basename(path)}: wrote {', '.join(written)}")
+    print(f"\nReported {len(paths) - failures} of {len(paths)} classes")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
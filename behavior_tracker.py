@@ -1,39 +1,27 @@
+import numpy as np
+import pandas as pd
+from color_scheme import ColorScheme
+from profiling import timed
+
+
+def week_start(days):
+    """Returns the Monday that starts the week of each datetime64[D] day (or of one day)."""
+    # Day 0 (1970-01-01) was a Thursday, three days after a Monday
+    return days - (days.astype(np.int64) + 3) % 7
+
+
 class BehaviorTracker:
     """Handles behavior color system and related functionality"""
     
-    def __init__(self):
-        # Define behavior colors from worst to best
-        self.colors = {
-            'Red': '#FF0000',      # Bad
-            'Orange': '#FF8C00',   # Less bad
-            'Yellow': '#FFD700',   # Needs improvement
-            'Green': '#32CD32',    # Good
-            'Blue': '#4169E1',     # Very good
-            'Purple': '#8A2BE2',   # Great
-            'Pink': '#FF69B4'      # Excellent
-        }
-        
-        self.color_descriptions = {
-            'Red': 'Poor behavior - needs immediate attention',
-            'Orange': 'Below expectations - requires improvement',
-            'Yellow': 'Needs improvement - making progress',
-            'Green': 'Good behavior - meeting expectations',
-            'Blue': 'Very good behavior - exceeding expectations',
-            'Purple': 'Great behavior - consistently excellent',
-            'Pink': 'Excellent behavior - exemplary student'
-        }
-        
-        # Point system for behavior tracking
-        self.color_points = {
-            'Red': -3,      # 3 bad points
-            'Orange': -2,   # 2 bad points
-            'Yellow': -1,   # 1 bad point
-            'Green': 1,     # 1 good point
-            'Blue': 2,      # 2 good points
-            'Purple': 3,    # 3 good points
-            'Pink': 4       # 4 good points
-        }
-    
+    def __init__(self, scheme=None):
+        # Behavior colors from worst to best; see color_scheme.py for loading a custom scale
+        self.scheme = scheme if scheme is not None else ColorScheme.default()
+
+        # Name-keyed views of the scheme
+        self.colors = dict(zip(self.scheme.names, self.scheme.hex_codes))
+        self.color_descriptions = dict(zip(self.scheme.names, self.scheme.descriptions))
+        self.color_points = {name: int(points) for name, points in zip(self.scheme.names, self.scheme.points)}
+
     def get_color_options(self):
         """Return the color mapping dictionary"""
         return self.colors
@@ -43,16 +31,13 @@ class BehaviorTracker:
         return self.color_descriptions
     
     def get_color_value(self, color_name):
-        """Get the numeric value of a color (0-6, higher is better)"""
-        color_names = list(self.colors.keys())
-        try:
-            return color_names.index(color_name)
-        except ValueError:
-            return 0  # Default to worst if color not found
+        """Get the numeric value of a color (0 to len(scheme) - 1, higher is better)"""
+        code = self.scheme.code(color_name)
+        return code if code != ColorScheme.NO_CODE else 0  # Default to worst if color not found
     
     def get_color_hex(self, color_name):
         """Get the hex color code for a given color name"""
-        return self.colors.get(color_name, '#000000')
+        return self.colors.get(color_name, ColorScheme.UNKNOWN_HEX)
     
     def validate_color(self, color_name):
         """Check if a color name is valid"""
@@ -62,31 +47,109 @@ class BehaviorTracker:
         """Get the point value for a given color"""
         return self.color_points.get(color_name, 0)
     
+    @timed
     def calculate_points_summary(self, student_data):
         """Calculate good points, bad points, and percentage for a student"""
         if student_data.empty:
-            return {
-                'total_good_points': 0,
-                'total_bad_points': 0,
-                'total_points': 0,
-                'good_percentage': 0,
-                'days_recorded': 0
-            }
-        
+            return self._empty_points_summary()
+
+        good_points, bad_points = self._split_points(student_data['color'])
+        total_good_points = int(good_points.sum())
+        total_bad_points = int(bad_points.sum())
+        return self._points_summary_dict(total_good_points, total_bad_points, len(student_data))
+
+    @timed
+    def summarize_points(self, behavior_data, start_date=None, end_date=None):
+        """Calculate the points summary for every student in one grouped pass.
+
+        Returns a DataFrame indexed by student name with the same keys as
+        calculate_points_summary as columns. Students with no entries in the
+        (optional, inclusive) date range are not included.
+        """
+        columns = list(self._empty_points_summary().keys())
+        if behavior_data is None or behavior_data.empty:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='student'))
+
+        data = behavior_data
+        if start_date is not None or end_date is not None:
+            dates = data['date']
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates)
+            dates = dates.dt.normalize()
+            mask = pd.Series(True, index=data.index)
+            if start_date is not None:
+                mask &= dates >= pd.Timestamp(start_date)
+            if end_date is not None:
+                mask &= dates <= pd.Timestamp(end_date)
+            data = data[mask]
+            if data.empty:
+                return pd.DataFrame(columns=columns, index=pd.Index([], name='student'))
+
+        good_points, bad_points = self._split_points(data['color'])
+        grouped = pd.DataFrame({
+            'student': data['student'].to_numpy(),
+            'total_good_points': good_points.to_numpy(),
+            'total_bad_points': bad_points.to_numpy(),
+        }).groupby('student', sort=False)
+
+        summary = grouped.sum()
+        summary['days_recorded'] = grouped.size()
+        summary['total_points'] = summary['total_good_points'] + summary['total_bad_points']
+        totals = summary['total_points'].where(summary['total_points'] > 0)
+        summary['good_percentage'] = (summary['total_good_points'] / totals * 100).fillna(0).round(1)
+        return summary[columns]
+
+    @timed
+    def summarize_points_by_week(self, behavior_data):
+        """Total good and bad points per calendar week, in one grouped pass.
+
+        Returns a DataFrame indexed by the Monday that starts each week, with
+        total_good_points and total_bad_points columns. Weeks without
+        entries are left out.
+        """
+        columns = ['total_good_points', 'total_bad_points']
+        if behavior_data is None or behavior_data.empty:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='week'), dtype='int64')
+
+        weeks = week_start(pd.to_datetime(behavior_data['date']).to_numpy().astype('datetime64[D]'))
+        good_points, bad_points = self._split_points(behavior_data['color'])
+        summary = pd.DataFrame({
+            'week': weeks.astype('datetime64[ns]'),
+            'total_good_points': good_points.to_numpy(),
+            'total_bad_points': bad_points.to_numpy(),
+        }).groupby('week').sum()
+        return summary[columns]
+
+    @timed
+    def summarize_color_counts(self, color_counts, days_recorded=None):
+        """Calculate the points summary from a mapping of color -> number of entries"""
         total_good_points = 0
         total_bad_points = 0
-        
-        for _, row in student_data.iterrows():
-            points = self.get_color_points(row['color'])
+        for color, count in color_counts.items():
+            points = self.get_color_points(color) * int(count)
             if points > 0:
                 total_good_points += points
             else:
                 total_bad_points += abs(points)
-        
+        if days_recorded is None:
+            days_recorded = sum(int(count) for _, count in color_counts.items())
+        return self._points_summary_dict(total_good_points, total_bad_points, days_recorded)
+
+    def summary_for_student(self, summaries, student_name):
+        """Look up one student's points summary dict from a summarize_points frame"""
+        if student_name not in summaries.index:
+            return self._empty_points_summary()
+        row = summaries.loc[student_name]
+        return self._points_summary_dict(int(row['total_good_points']), int(row['total_bad_points']), int(row['days_recorded']))
+
+    def _split_points(self, colors):
+        """Map a Series of color names to (good points, bad points) Series"""
+        points = pd.Series(self.scheme.points_from_codes(self.scheme.codes_from_names(colors)), index=colors.index)
+        return points.clip(lower=0), (-points).clip(lower=0)
+
+    def _points_summary_dict(self, total_good_points, total_bad_points, days_recorded):
         total_points = total_good_points + total_bad_points
         good_percentage = (total_good_points / total_points * 100) if total_points > 0 else 0
-        days_recorded = len(student_data)
-        
         return {
             'total_good_points': total_good_points,
             'total_bad_points': total_bad_points,
@@ -94,4 +157,12 @@ class BehaviorTracker:
             'good_percentage': round(good_percentage, 1),
             'days_recorded': days_recorded
         }
-    
+
+    def _empty_points_summary(self):
+        return {
+            'total_good_points': 0,
+            'total_bad_points': 0,
+            'total_points': 0,
+            'good_percentage': 0,
+            'days_recorded': 0
+        }
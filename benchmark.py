@@ -0,0 +1,310 @@
+"""Headless benchmarks for the behavior tracker.
+
+Generates a synthetic class (roster plus daily history), then times the
+operations the app leans on: loading an upload, adding entries one at a
+time, per-student reads and summaries, and building the Excel and
+printable reports. Results are written as JSON so runs from different
+commits can be compared:
+
+    python benchmark.py --scale medium --output before.json
+    python benchmark.py --scale medium --output after.json --compare before.json
+
+It also measures app.py's cold-start import time in a fresh interpreter and
+fails (exit status 1) if it exceeds the budget, or if a module meant to be
+loaded lazily is imported at startup. To run only that check:
+
+    python benchmark.py --imports-only
+
+No Streamlit server is needed. The report steps call the same reports.py
+functions the app's generate_excel_report / generate_printable_html use,
+without the app's result cache.
+"""
+import argparse
+import ast
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_manager as data_manager_module
+import reports
+from behavior_tracker import BehaviorTracker
+from data_manager import DataManager
+
+# (students, school days) per named scale; 3 school years is ~540 weekdays
+SCALES = {
+    'tiny': (20, 30),
+    'small': (100, 180),
+    'medium': (1000, 365),
+    'large': (5000, 540),
+}
+
+# Time app.py's own imports may add to a cold start, on top of Streamlit and pandas
+APP_IMPORT_BUDGET_MS = 300
+# Modules app.py must not load until a chart or report is first needed
+LAZY_MODULES = ('plotly.express', 'xlsxwriter')
+
+# Share of entries per color on the default seven-color scale, worst to
+# best; most days are good days. Other scales get this curve stretched to fit.
+COLOR_WEIGHTS = [0.01, 0.02, 0.04, 0.08, 0.15, 0.45, 0.15]
+
+
+# --- Synthetic Data ---
+
+def generate_class(n_students, n_days, seed=0, fill=0.9, tracker=None):
+    """Returns (roster, entries) for a synthetic class.
+
+    The roster is a list of unique names. Entries is a student/date/color
+    DataFrame covering `n_days` consecutive weekdays, with each student
+    recorded on roughly `fill` of them.
+    """
+    tracker = tracker if tracker is not None else BehaviorTracker()
+    colors = list(tracker.get_color_options().keys())
+    weights = np.interp(np.linspace(0, 1, len(colors)), np.linspace(0, 1, len(COLOR_WEIGHTS)), COLOR_WEIGHTS)
+    weights /= weights.sum()
+
+    rng = np.random.default_rng(seed)
+    roster = [f"Student {i:05d}" for i in range(n_students)]
+    days = pd.bdate_range('2022-08-15', periods=n_days)
+
+    student_codes = np.repeat(np.arange(n_students), n_days)
+    day_codes = np.tile(np.arange(n_days), n_students)
+    recorded = rng.random(len(student_codes)) < fill
+    student_codes, day_codes = student_codes[recorded], day_codes[recorded]
+    color_codes = rng.choice(len(colors), size=len(student_codes), p=weights)
+
+    entries = pd.DataFrame({
+        'student': np.asarray(roster, dtype=object)[student_codes],
+        'date': days[day_codes].strftime('%Y-%m-%d'),
+        'color': np.asarray(colors, dtype=object)[color_codes],
+    })
+    return roster, entries
+
+
+def as_upload(entries, name='benchmark.csv'):
+    """Wraps a student/date/color DataFrame as an uploaded CSV file."""
+    upload = io.BytesIO(entries.to_csv(index=False).encode('utf-8'))
+    upload.name = name
+    return upload
+
+
+# --- Timing ---
+
+def timed(fn, repeat=3, setup=None):
+    """Runs fn `repeat` times (after setup(), if given) and returns the timings in seconds."""
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def record(results, name, runs, ops=1):
+    best = min(runs)
+    results[name] = {
+        'seconds': best,
+        'median_seconds': float(np.median(runs)),
+        'runs': runs,
+        'ops': ops,
+        'per_op_us': best / ops * 1e6 if ops else None,
+    }
+    print(f"{name:<34} {best * 1000:10.2f} ms   ({ops} ops, {best / max(ops, 1) * 1e6:.1f} us/op)", flush=True)
+
+
+def run_benchmarks(n_students, n_days, repeat=3, sample_students=200, report_students=50, seed=0):
+    """Runs every benchmark and returns {name: timing dict}."""
+    tracker = BehaviorTracker()
+    roster, entries = generate_class(n_students, n_days, seed=seed, tracker=tracker)
+    upload = as_upload(entries)
+    print(f"{n_students} students x {n_days} days: {len(entries)} entries, {len(upload.getvalue()) / 1e6:.1f} MB CSV", flush=True)
+    results = {}
+
+    def load():
+        dm = DataManager(tracker=tracker)
+        success, message = dm.load_data_from_file(upload)
+        if not success:
+            raise RuntimeError(message)
+        return dm
+
+    # Cold loads parse the file; repeat uploads of the same file hit the parse cache
+    record(results, 'load_data_from_file', timed(load, repeat, setup=data_manager_module._parsed_uploads.clear), len(entries))
+    record(results, 'load_data_from_file_cached', timed(load, repeat), len(entries))
+
+    # One new school day for every student, entered one at a time as in speed mode
+    next_day = (pd.Timestamp(entries['date'].max()) + pd.offsets.BDay(1)).strftime('%Y-%m-%d')
+    colors = list(tracker.get_color_options().keys())
+    fresh = {}
+
+    def reload():
+        fresh['dm'] = load()
+
+    def add_day():
+        dm = fresh['dm']
+        for i, student in enumerate(roster):
+            dm.add_behavior_entry(student, colors[i % len(colors)], next_day)
+    record(results, 'add_behavior_entry_sequential', timed(add_day, repeat, setup=reload), len(roster))
+
+    dm = load()
+    sample = roster[::max(1, len(roster) // sample_students)][:sample_students]
+    record(results, 'get_student_behavior_data', timed(lambda: [dm.get_student_behavior_data(s) for s in sample], 1), len(sample))
+    record(results, 'get_student_behavior_data_cached', timed(lambda: [dm.get_student_behavior_data(s) for s in sample], repeat), len(sample))
+
+    student_frames = [dm.get_student_behavior_data(s) for s in sample]
+    record(results, 'calculate_points_summary', timed(lambda: [tracker.calculate_points_summary(f) for f in student_frames], repeat), len(sample))
+
+    start_date, end_date = pd.Timestamp(entries['date'].min()).date(), pd.Timestamp(entries['date'].max()).date()
+    record(results, 'generate_excel_report', timed(lambda: reports.build_excel_report(dm, tracker, roster, start_date, end_date), repeat), len(roster))
+
+    report_roster = roster[:report_students]
+    for style in ('static', 'interactive'):
+        def printable():
+            payloads = [reports.student_report_payload(dm, tracker, s) for s in report_roster]
+            return reports.assemble_printable_html(reports.render_student_sections(payloads, style=style))
+        record(results, f'generate_printable_html_{style}', timed(printable, repeat), len(report_roster))
+
+    return results
+
+
+# --- Cold Start ---
+
+_IMPORT_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+import streamlit, pandas
+baseline = set(sys.modules)
+framework = time.perf_counter() - start
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+own = time.perf_counter() - start
+print(json.dumps({'framework': framework, 'own': own, 'loaded': sorted(set(sys.modules) - baseline)}))
+"""
+
+
+def app_import_modules():
+    """Returns the modules app.py imports at its top level."""
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    with open(app_path) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+
+def measure_app_imports(repeat=3):
+    """Imports app.py's top-level modules in fresh interpreters.
+
+    Returns (seconds per run for the modules beyond Streamlit and pandas,
+    the LAZY_MODULES that those imports loaded).
+    """
+    modules = app_import_modules()
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs, eager = [], set()
+    for _ in range(repeat):
+        probe = subprocess.run([sys.executable, '-c', _IMPORT_PROBE, *modules], capture_output=True, text=True,
+                               cwd=here, env={**os.environ, 'PYTHONPATH': here}, check=True)
+        timing = json.loads(probe.stdout.strip().splitlines()[-1])
+        runs.append(timing['own'])
+        eager.update(name for name in timing['loaded'] if name in LAZY_MODULES)
+    return runs, sorted(eager)
+
+
+def check_app_imports(results, budget_ms=APP_IMPORT_BUDGET_MS, repeat=3):
+    """Records the app import time and returns a list of budget violations."""
+    runs, eager = measure_app_imports(repeat)
+    record(results, 'app_cold_import', runs)
+    problems = [f"app.py imports {name} at startup; load it where it is used" for name in eager]
+    if min(runs) * 1000 > budget_ms:
+        problems.append(f"app.py imports take {min(runs) * 1000:.0f} ms, over the {budget_ms} ms budget")
+    return problems
+
+
+# --- Reporting ---
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'report_executor': reports.REPORT_EXECUTOR,
+        'report_workers': reports.REPORT_WORKERS,
+    }
+
+
+def compare(results, baseline_path):
+    """Prints each benchmark's change against a previous JSON result file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f"\nChange vs {baseline_path}:")
+    for name, timing in results.items():
+        if name in baseline and baseline[name]['seconds']:
+            ratio = timing['seconds'] / baseline[name]['seconds']
+            print(f"{name:<34} {baseline[name]['seconds'] * 1000:10.2f} ms -> {timing['seconds'] * 1000:10.2f} ms  ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small', help="named class size (default: small)")
+    parser.add_argument('--students', type=int, help="number of students (overrides --scale)")
+    parser.add_argument('--days', type=int, help="number of school days (overrides --scale)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark; the fastest is reported")
+    parser.add_argument('--sample-students', type=int, default=200, help="students timed for per-student reads")
+    parser.add_argument('--report-students', type=int, default=50, help="students included in the printable report")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--compare', help="print the change against a previous JSON result file")
+    parser.add_argument('--import-budget-ms', type=float, default=APP_IMPORT_BUDGET_MS,
+                        help="fail if app.py's own imports take longer than this")
+    parser.add_argument('--imports-only', action='store_true', help="only run the cold-start import check")
+    args = parser.parse_args(argv)
+
+    n_students, n_days = SCALES[args.scale]
+    n_students = args.students or n_students
+    n_days = args.days or n_days
+
+    results = {}
+    problems = check_app_imports(results, args.import_budget_ms, args.repeat)
+    if not args.imports_only:
+        results.update(run_benchmarks(n_students, n_days, args.repeat, args.sample_students, args.report_students, args.seed))
+    output = {
+        'environment': environment(),
+        'parameters': {'students': n_students, 'days': n_days, 'repeat': args.repeat, 'seed': args.seed,
+                       'sample_students': args.sample_students, 'report_students': args.report_students},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
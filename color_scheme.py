@@ -0,0 +1,141 @@
+import json
+import re
+import numpy as np
+import pandas as pd
+
+
+class ColorScheme:
+    """Immutable behavior color scale compiled into aligned arrays.
+
+    A color's code is its position in the scale, from worst to best, and
+    indexes `names`, `hex_codes`, `points` and `descriptions` alike. Codes
+    are int8, with NO_CODE (-1) for unknown or missing colors; the lookups
+    below map it to 0 points and a black hex code.
+
+    Schemes are validated when they are built, so a custom scale loaded
+    with from_records() or from_json() fails up front rather than mid-report.
+    """
+
+    NO_CODE = -1
+    UNKNOWN_HEX = '#000000'
+    MAX_COLORS = 127 # Codes are stored as int8
+    HEX_PATTERN = re.compile(r'^#[0-9A-Fa-f]{6}$')
+
+    def __init__(self, names, hex_codes, points, descriptions):
+        names, hex_codes, points, descriptions = list(names), list(hex_codes), list(points), list(descriptions)
+        self._validate(names, hex_codes, points, descriptions)
+
+        object.__setattr__(self, 'names', tuple(names))
+        object.__setattr__(self, 'hex_codes', tuple(hex_codes))
+        object.__setattr__(self, 'points', self._frozen(np.array(points, dtype=np.int64)))
+        object.__setattr__(self, 'descriptions', tuple(descriptions))
+        object.__setattr__(self, '_codes', {name: code for code, name in enumerate(names)})
+        # Lookup tables with a trailing entry, which a NO_CODE (-1) code indexes directly
+        object.__setattr__(self, '_hex_lookup', self._frozen(np.array(hex_codes + [self.UNKNOWN_HEX], dtype=object)))
+        object.__setattr__(self, '_points_lookup', self._frozen(np.array(points + [0], dtype=np.int64)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ColorScheme is immutable")
+
+    def __len__(self):
+        return len(self.names)
+
+    def __eq__(self, other):
+        if not isinstance(other, ColorScheme):
+            return NotImplemented
+        return self.records() == other.records()
+
+    def __hash__(self):
+        return hash(tuple(tuple(record.values()) for record in self.records()))
+
+    @classmethod
+    def default(cls):
+        """The classroom's seven-color scale, Red (worst) to Pink (best)"""
+        return cls.from_records(DEFAULT_SCHEME)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a scheme from a worst-to-best list of dicts with name, hex, points and description keys"""
+        records = list(records)
+        for position, record in enumerate(records):
+            missing = [key for key in ('name', 'hex', 'points') if key not in record]
+            if missing:
+                raise ValueError(f"Color {position + 1} is missing {', '.join(missing)}")
+        return cls([record['name'] for record in records],
+                   [record['hex'] for record in records],
+                   [record['points'] for record in records],
+                   [record.get('description', '') for record in records])
+
+    @classmethod
+    def from_json(cls, path):
+        """Load a scheme from a JSON file holding a from_records list (or {"colors": [...]})"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('colors', [])
+        return cls.from_records(data)
+
+    def records(self):
+        """The scheme as a from_records list"""
+        return [{'name': name, 'hex': hex_code, 'points': int(points), 'description': description}
+                for name, hex_code, points, description in zip(self.names, self.hex_codes, self.points, self.descriptions)]
+
+    def code(self, name):
+        """Code of one color name, or NO_CODE if it is not in the scheme"""
+        return self._codes.get(name, self.NO_CODE)
+
+    def codes_from_names(self, names):
+        """Map a Series, array or list of color names to an int8 array of codes"""
+        if isinstance(names, pd.Series) and isinstance(names.dtype, pd.CategoricalDtype):
+            # Translate each category once, then index by the category codes;
+            # the trailing NO_CODE catches missing (-1) category codes
+            lookup = np.array([self.code(c) for c in names.cat.categories] + [self.NO_CODE], dtype=np.int8)
+            return lookup[names.cat.codes.to_numpy()]
+        return pd.Categorical(np.asarray(names, dtype=object), categories=self.names).codes.astype(np.int8)
+
+    def points_from_codes(self, codes):
+        """Map an array or Series of codes to an int64 array of points (0 for NO_CODE)"""
+        return self._points_lookup[np.asarray(codes, dtype=np.intp)]
+
+    def hex_from_codes(self, codes):
+        """Map an array or Series of codes to an array of hex codes (UNKNOWN_HEX for NO_CODE)"""
+        return self._hex_lookup[np.asarray(codes, dtype=np.intp)]
+
+    @staticmethod
+    def _frozen(array):
+        array.flags.writeable = False
+        return array
+
+    @classmethod
+    def _validate(cls, names, hex_codes, points, descriptions):
+        if not names:
+            raise ValueError("A color scheme needs at least one color")
+        if len(names) > cls.MAX_COLORS:
+            raise ValueError(f"A color scheme can have at most {cls.MAX_COLORS} colors")
+        if not len(names) == len(hex_codes) == len(points) == len(descriptions):
+            raise ValueError("Color names, hex codes, points and descriptions must line up")
+        for name, hex_code, value, description in zip(names, hex_codes, points, descriptions):
+            # Uploaded colors are title-cased before matching, so names must be too
+            if not isinstance(name, str) or not name.strip() or name != name.strip().title():
+                raise ValueError(f"Color name {name!r} must be non-empty and title case")
+            if not isinstance(hex_code, str) or not cls.HEX_PATTERN.match(hex_code):
+                raise ValueError(f"{name}: hex code {hex_code!r} is not of the form #RRGGBB")
+            if isinstance(value, bool) or not isinstance(value, (int, np.integer)):
+                raise ValueError(f"{name}: points {value!r} must be a whole number")
+            if not isinstance(description, str):
+                raise ValueError(f"{name}: description must be text")
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate colors: {', '.join(duplicates)}")
+
+
+# Worst to best
+DEFAULT_SCHEME = [
+    {'name': 'Red', 'hex': '#FF0000', 'points': -3, 'description': 'Poor behavior - needs immediate attention'},
+    {'name': 'Orange', 'hex': '#FF8C00', 'points': -2, 'description': 'Below expectations - requires improvement'},
+    {'name': 'Yellow', 'hex': '#FFD700', 'points': -1, 'description': 'Needs improvement - making progress'},
+    {'name': 'Green', 'hex': '#32CD32', 'points': 1, 'description': 'Good behavior - meeting expectations'},
+    {'name': 'Blue', 'hex': '#4169E1', 'points': 2, 'description': 'Very good behavior - exceeding expectations'},
+    {'name': 'Purple', 'hex': '#8A2BE2', 'points': 3, 'description': 'Great behavior - consistently excellent'},
+    {'name': 'Pink', 'hex': '#FF69B4', 'points': 4, 'description': 'Excellent behavior - exemplary student'},
+]
@@ -0,0 +1 @@
+# Lets tests under tests/ import the app's top-level modules
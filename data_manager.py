@@ -1,117 +1,969 @@
+import hashlib
+from collections import deque
+import numpy as np
 import pandas as pd
 import io
+from behavior_tracker import BehaviorTracker
+from color_scheme import ColorScheme
+from profiling import timed
+from result_cache import ResultCache
+
+try:
+    import python_calamine # noqa: F401 -- enables pandas' fast read-only 'calamine' Excel engine
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = None # pandas' default engine
+
+# Parsed uploads by content hash, shared by every session in the process
+PARSED_UPLOADS_BYTES = 256 * 1024 * 1024
+_parsed_uploads = ResultCache(max_entries=16, keep_versions=True, max_bytes=PARSED_UPLOADS_BYTES)
+
+
+class _KeyIndex:
+    """Maps packed (student, day) keys to row positions.
+
+    Keys are kept in a sorted int64 array with the row positions alongside
+    and looked up with searchsorted, about 12 bytes an entry where a dict
+    costs around 100. Single appends go to a small overflow dict, which is
+    merged into the arrays once it outgrows a fraction of them.
+    """
+
+    MIN_OVERFLOW = 1024
+
+    def __init__(self, keys=None, rows=None):
+        keys = np.empty(0, dtype=np.int64) if keys is None else np.asarray(keys, dtype=np.int64)
+        rows = np.arange(len(keys)) if rows is None else rows
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._rows = np.asarray(rows, dtype=np.int32)[order]
+        self._overflow = {}
+
+    def __len__(self):
+        return len(self._keys) + len(self._overflow)
+
+    @property
+    def nbytes(self):
+        # An overflow dict entry (hash, key and value) costs roughly 100 bytes
+        return self._keys.nbytes + self._rows.nbytes + 100 * len(self._overflow)
+
+    def get(self, key):
+        """Row of one packed key, or None."""
+        row = self._overflow.get(key)
+        if row is not None:
+            return row
+        i = int(np.searchsorted(self._keys, key))
+        if i < len(self._keys) and self._keys[i] == key:
+            return int(self._rows[i])
+        return None
+
+    def lookup(self, keys):
+        """Rows of an array of packed keys, -1 where a key is not indexed."""
+        self._merge_overflow()
+        if not len(self._keys):
+            return np.full(len(keys), -1, dtype=np.intp)
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return np.where(self._keys[positions] == keys, self._rows[positions], -1).astype(np.intp)
+
+    def add(self, key, row):
+        self._overflow[key] = row
+        if len(self._overflow) > max(self.MIN_OVERFLOW, len(self._keys) // 8):
+            self._merge_overflow()
+
+    def add_many(self, keys, rows):
+        """Indexes an array of keys that are not indexed yet."""
+        self._merge_overflow()
+        self._merge(np.asarray(keys, dtype=np.int64), rows)
+
+    def copy(self):
+        index = _KeyIndex.__new__(_KeyIndex)
+        index._keys, index._rows, index._overflow = self._keys.copy(), self._rows.copy(), dict(self._overflow)
+        return index
+
+    def _merge_overflow(self):
+        if self._overflow:
+            keys = np.fromiter(self._overflow.keys(), dtype=np.int64, count=len(self._overflow))
+            rows = np.fromiter(self._overflow.values(), dtype=np.int32, count=len(self._overflow))
+            self._overflow = {}
+            self._merge(keys, rows)
+
+    def _merge(self, keys, rows):
+        order = np.argsort(keys, kind='stable')
+        positions = np.searchsorted(self._keys, keys[order])
+        self._keys = np.insert(self._keys, positions, keys[order])
+        self._rows = np.insert(self._rows, positions, np.asarray(rows, dtype=np.int32)[order])
+
 
 class DataManager:
-    """Handles in-memory data management for behavior tracking."""
+    """Handles in-memory data management for behavior tracking.
+
+    Entries are stored column-wise in compact arrays: the student as an int32
+    code into the roster, the color as an int8 code in BehaviorTracker's
+    worst-to-best order, and the date as datetime64[D]. Upserts find their
+    row through a sorted array of packed (student, date) keys (see
+    _KeyIndex). A date-sorted order over
+    the rows is kept alongside (appending today's entries extends it in
+    place), so the tabular views are built in date order and date ranges
+    are found by binary search. The `behavior_data` view is only rebuilt
+    when it is read after a change, and names are turned back into strings
+    only on export.
 
-    def __init__(self):
-        self.behavior_data = None # Will be a DataFrame once loaded
+    Read methods hand out shallow views of cached frames rather than deep
+    copies. Under pandas' copy-on-write, a caller that modifies a view gets
+    its own copy of just the columns it touches; the cache is untouched.
 
+    Per-student color counts are maintained on every write, so distribution
+    and points summaries for one student cost O(colors) rather than a scan.
+
+    Every write bumps a monotonically increasing data version, both globally
+    and for the students it touched, so rendered results can be cached
+    against (student, version) and reused until that student changes.
+
+    An optional durable `store` (see storage.py) is written through on every
+    change and, if it already holds data, used to populate the manager on
+    startup. File upload and CSV download then act as import/export.
+    """
+
+    COLUMNS = ['student', 'date', 'color']
+    NO_COLOR = ColorScheme.NO_CODE # Color code for unknown/missing colors
+    CSV_CHUNK_ROWS = 50000 # Rows parsed and validated at a time on upload
+    MAX_REPORTED_ISSUES = 50
+    FORMAT_HINT = "It must have a single column of names, or columns named 'student', 'date', and 'color'."
+    MERGE_POLICIES = ('last', 'worst', 'best')
+    CHANGE_LOG_SIZE = 1000 # Writes remembered for get_changes_since
+    ANY_DAY = np.datetime64('0001-01-01', 'D') # From get_changes_since: any day may have changed
+
+    def __init__(self, tracker=None, store=None):
+        self.tracker = tracker if tracker is not None else BehaviorTracker()
+        self.color_names = list(self.tracker.scheme.names)
+
+        self._students = None     # Roster in display order; None until data is loaded
+        self._student_codes = {}  # student name -> int32 code (position in the roster)
+        self._student_col = np.empty(0, dtype=np.int32)
+        self._color_col = np.empty(0, dtype=np.int8)
+        self._date_col = np.empty(0, dtype='datetime64[D]')
+        self._size = 0            # Number of live rows in the column arrays
+        self._index = _KeyIndex() # packed (student code, day) key -> row position
+        self._order = np.empty(0, dtype=np.intp) # Row positions sorted by date; None when stale
+        self._order_len = 0
+        self._frame = None        # Lazily consolidated DataFrame of the store
+        self._entries_frame = None # Lazily built, date-sorted DataFrame of the entries
+        self._sorted_days = None  # Dates of _entries_frame, for binary search
+        self._student_frames = {} # student name -> (version, frame) from get_student_behavior_data
+        self._download = None     # (version, CSV bytes) from get_data_for_download
+        # Entries per (student code, color code); the extra last column counts
+        # unknown colors, which a NO_COLOR (-1) code indexes directly
+        self._color_counts = np.zeros((0, len(self.color_names) + 1), dtype=np.int64)
+        self._version = 0           # Bumped on every write
+        self._student_versions = {} # student name -> version of their last change
+        self._change_log = deque(maxlen=self.CHANGE_LOG_SIZE) # (version, earliest day the write touched)
+
+        self.last_load_issues = [] # "Line N: problem" messages for rows skipped by the last upload
+        self.last_merge_conflicts = None # DataFrame of the conflicting entries in the last merge
+
+        self.store = store
+        if store is not None and store.has_data():
+            self._load_frame(store.load_frame())
+
+    @property
+    def behavior_data(self):
+        """The full store as a DataFrame, with a placeholder row (no date/color)
+        for every student that has no entries. None until data is loaded."""
+        if self._students is None:
+            return None
+        if self._frame is None:
+            self._frame = self._consolidate()
+        return self._frame
+
+    @behavior_data.setter
+    def behavior_data(self, df):
+        if df is None:
+            self._students = None
+            self._student_codes = {}
+            self._reset_rows()
+            self._bump_version()
+        else:
+            self._load_frame(df)
+
+    def has_data(self):
+        """Whether a roster has been loaded; unlike behavior_data, this never builds a frame."""
+        return self._students is not None
+
+    @timed
     def load_data_from_file(self, uploaded_file):
-        """Loads data from an uploaded CSV or Excel file into memory."""
+        """Loads data from an uploaded CSV or Excel file into memory.
+
+        CSV files are read and validated in chunks. Rows with a missing
+        student, an unreadable date or an unknown color are skipped and
+        listed in `last_load_issues` with their line numbers. Parsed files
+        are cached by content hash, so uploading the same file again skips
+        parsing entirely.
+        """
         try:
-            # Set the uploaded file's internal pointer to the beginning
-            uploaded_file.seek(0)
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
-
-            # Case 1: It's a fresh roster with just one column of names
-            if 'date' not in df.columns and 'color' not in df.columns:
-                student_names = df.iloc[:, 0].dropna().astype(str).tolist()
-                self.behavior_data = pd.DataFrame({
-                    'student': student_names,
-                    'date': [pd.NaT] * len(student_names), # Use NaT for dates
-                    'color': [None] * len(student_names)
-                }).dropna(subset=['student'])
-            # Case 2: It's an existing data file
-            elif 'student' in df.columns and 'date' in df.columns and 'color' in df.columns:
-                self.behavior_data = df.dropna(subset=['student']).copy()
-            else:
-                return False, "File is not in a recognized format. It must have a single column of names, or columns named 'student', 'date', and 'color'."
+            parsed = self._read_upload(uploaded_file)
+            if parsed is False:
+                return False, f"File is not in a recognized format. {self.FORMAT_HINT}"
+
+            roster, student_codes, dates, color_codes, issues = parsed
+            self._load_codes(roster, student_codes, dates, color_codes)
+            self.last_load_issues = issues
 
-            return True, f"Successfully loaded data for {len(self.get_student_list())} students."
+            if self.store is not None:
+                self.store.replace_all(self._students, self._iter_entries())
+
+            message = f"Successfully loaded data for {len(self.get_student_list())} students."
+            if issues:
+                message += f" Skipped {len(issues)} invalid row(s)."
+            return True, message
 
         except Exception as e:
             return False, f"Error reading file: {str(e)}"
 
+    @timed
+    def merge_data_from_files(self, uploaded_files, policy='last'):
+        """Merges one or more uploaded CSV or Excel files into the current data.
+
+        Each file is parsed and validated as by load_data_from_file, and
+        skipped rows are listed in `last_load_issues` under the file's name.
+        The current data and then the files, in the order given, are
+        combined with a hash join on (student, date): all their rows are
+        keyed by packed (student, date) and grouped in one pass, so the cost
+        is linear in the total number of rows. A day repeated within one
+        source keeps that source's last row, as on upload. Where sources
+        give a student different colors for the same day, `policy` picks
+        one: 'last' keeps the latest source's color, 'worst' and 'best' the
+        lowest or highest color in the color scheme's order. Each conflict is listed in
+        `last_merge_conflicts`, one row per source, with the color kept.
+        Students new to the roster are added after the current ones.
+
+        Returns (success, message); nothing changes if a file cannot be read.
+        """
+        if policy not in self.MERGE_POLICIES:
+            raise ValueError(f"Unknown merge policy {policy!r}; expected one of {', '.join(self.MERGE_POLICIES)}")
+        uploaded_files = list(uploaded_files)
+        if not uploaded_files:
+            return False, "Choose at least one file to merge."
+
+        try:
+            sources, issues = [], []
+            if self._students is not None:
+                sources.append(("Current data",) + self._current_columns())
+            for uploaded_file in uploaded_files:
+                parsed = self._read_upload(uploaded_file)
+                if parsed is False:
+                    return False, f"{uploaded_file.name} is not in a recognized format. {self.FORMAT_HINT}"
+                roster, student_codes, dates, color_codes, file_issues = parsed
+                sources.append((uploaded_file.name, np.asarray(roster, dtype=object)[student_codes], dates, color_codes))
+                issues.extend(f"{uploaded_file.name}: {issue}" for issue in file_issues)
+
+            names, dates, color_codes = (np.concatenate([source[i] for source in sources]) for i in (1, 2, 3))
+            source_ids = np.repeat(np.arange(len(sources)), [len(source[1]) for source in sources])
+            # Current students keep their places; new ones follow in order of appearance
+            roster = pd.unique(names).tolist()
+            student_codes = pd.Categorical(names, categories=roster).codes.astype(np.int32)
+
+            is_entry = ~np.isnat(dates) & (color_codes != self.NO_COLOR)
+            rows = pd.DataFrame({
+                'key': self._pack_keys(student_codes[is_entry], dates[is_entry]),
+                'student': student_codes[is_entry],
+                'day': dates[is_entry],
+                'color': color_codes[is_entry],
+                'source': source_ids[is_entry],
+            })
+            # Only disagreements between sources are conflicts; a file's own repeats keep its last row
+            rows = rows[~rows.duplicated(['key', 'source'], keep='last').to_numpy()]
+            grouped = rows.groupby('key', sort=False)
+            merged = grouped.agg(student=('student', 'first'), day=('day', 'first'),
+                                 color=('color', {'last': 'last', 'worst': 'min', 'best': 'max'}[policy]))
+
+            colors_per_key = grouped['color'].nunique()
+            conflicts = rows[rows['key'].isin(colors_per_key.index[colors_per_key.to_numpy() > 1])]
+            self.last_merge_conflicts = pd.DataFrame({
+                'student': np.asarray(roster, dtype=object)[conflicts['student'].to_numpy()],
+                'date': conflicts['day'].to_numpy(),
+                'source': np.asarray([source[0] for source in sources], dtype=object)[conflicts['source'].to_numpy()],
+                'color': np.asarray(self.color_names, dtype=object)[conflicts['color'].to_numpy()],
+                'kept': np.asarray(self.color_names, dtype=object)[merged['color'].reindex(conflicts['key']).to_numpy()],
+            }).sort_values(['student', 'date'], kind='stable', ignore_index=True)
+
+            # One placeholder row per student first, so the roster keeps its order
+            self._load_columns(
+                np.concatenate([np.asarray(roster, dtype=object), np.asarray(roster, dtype=object)[merged['student'].to_numpy()]]),
+                np.concatenate([np.full(len(roster), np.datetime64('NaT'), dtype='datetime64[D]'), merged['day'].to_numpy().astype('datetime64[D]')]),
+                np.concatenate([np.full(len(roster), self.NO_COLOR, dtype=np.int8), merged['color'].to_numpy().astype(np.int8)]))
+            self.last_load_issues = issues[:self.MAX_REPORTED_ISSUES] + (
+                [f"...and {len(issues) - self.MAX_REPORTED_ISSUES} more"] if len(issues) > self.MAX_REPORTED_ISSUES else [])
+
+            if self.store is not None:
+                self.store.replace_all(self._students, self._iter_entries())
+
+            n_conflicts = conflicts['key'].nunique()
+            message = f"Merged {len(uploaded_files)} file(s): {len(roster)} students and {len(merged)} entries."
+            if n_conflicts:
+                message += f" Resolved {n_conflicts} conflicting entr{'y' if n_conflicts == 1 else 'ies'}."
+            if issues:
+                message += f" Skipped {len(issues)} invalid row(s)."
+            return True, message
+
+        except Exception as e:
+            return False, f"Error merging files: {str(e)}"
+
     def get_student_list(self):
         """Returns a list of unique student names from the loaded data."""
-        if self.behavior_data is not None:
-            return self.behavior_data['student'].dropna().unique().tolist()
+        if self._students is not None:
+            return list(self._students)
         return []
 
+    @timed
     def add_behavior_entry(self, student_name, color, date_str):
-        """Adds or updates a behavior entry in the in-memory DataFrame."""
-        if self.behavior_data is None:
+        """Adds or updates a behavior entry in the in-memory store."""
+        day = self._to_day(date_str)
+        color_code = self.tracker.scheme.code(color)
+        if self._students is None or day is None or color_code == self.NO_COLOR:
             return False
 
-        # Find if an entry for this student and date already exists
-        existing_entry_mask = (self.behavior_data['student'] == student_name) & (self.behavior_data['date'] == date_str)
-        
-        if existing_entry_mask.any():
-            # Update existing entry
-            self.behavior_data.loc[existing_entry_mask, 'color'] = color
+        student_code = self._student_codes.get(student_name)
+        if student_code is None:
+            # A student we have not seen before gets added to the roster
+            student_code = self._add_student(student_name)
+            if self.store is not None:
+                self.store.add_student(student_name)
+
+        # Upsert by (student, date); the student's placeholder row disappears
+        # from behavior_data once they have at least one entry
+        key = self._pack_key(student_code, day)
+        row = self._index.get(key)
+        if row is None:
+            row = self._append_row(student_code, day)
+            self._index.add(key, row)
         else:
-            # Add new entry
-            # Check if there's a placeholder row for the student with no date/color
-            placeholder_mask = (self.behavior_data['student'] == student_name) & (self.behavior_data['date'].isnull())
-            if placeholder_mask.any():
-                # Use the first available placeholder row for this student
-                idx = self.behavior_data[placeholder_mask].index[0]
-                self.behavior_data.loc[idx, ['date', 'color']] = [date_str, color]
-            else:
-                # Append a completely new row
-                new_entry = pd.DataFrame({
-                    'student': [student_name],
-                    'date': [date_str],
-                    'color': [color]
-                })
-                self.behavior_data = pd.concat([self.behavior_data, new_entry], ignore_index=True)
+            # Overwriting an entry moves its count to the new color
+            self._color_counts[student_code, self._color_col[row]] -= 1
+        self._color_col[row] = color_code
+        self._color_counts[student_code, color_code] += 1
+        self._invalidate()
+        self._bump_version(student_name, since=day)
+
+        if self.store is not None:
+            self.store.upsert_entry(student_name, str(day), color)
         return True
 
+    @timed
+    def add_behavior_entries(self, entries):
+        """Adds or updates many (student, color, date) entries in one merge.
+
+        Equivalent to calling add_behavior_entry for each entry in order
+        (later entries for the same student and date win, and unknown
+        students join the roster), but the store, counts, versions and any
+        durable store are updated once. Entries with an unknown color or an
+        unreadable date are skipped. Returns the number of entries applied.
+        """
+        if self._students is None:
+            return 0
+        entries = list(entries)
+        if not entries:
+            return 0
+
+        names, colors, raw_dates = zip(*entries)
+        days = pd.to_datetime(pd.Series(raw_dates, dtype=object), errors='coerce', format='mixed').to_numpy().astype('datetime64[D]')
+        color_codes = self.tracker.scheme.codes_from_names(list(colors))
+        valid = ~np.isnat(days) & (color_codes != self.NO_COLOR)
+        if not valid.any():
+            return 0
+        names = np.asarray(names, dtype=object)[valid]
+        days, color_codes = days[valid], color_codes[valid]
+
+        # Students we have not seen before join the roster in order of appearance
+        for student_name in pd.unique(names):
+            if student_name not in self._student_codes:
+                self._add_student(student_name)
+                if self.store is not None:
+                    self.store.add_student(student_name)
+        student_codes = np.fromiter((self._student_codes[name] for name in names), dtype=np.int32, count=len(names))
+
+        # Within the batch the last entry for a (student, date) wins
+        keys = self._pack_keys(student_codes, days)
+        last = np.flatnonzero(~pd.Series(keys).duplicated(keep='last').to_numpy())
+        keys, student_codes, days, color_codes = keys[last], student_codes[last], days[last], color_codes[last]
+
+        rows = self._index.lookup(keys)
+        existing = rows >= 0
+
+        # Overwrites move their counts from the old color to the new one
+        old_rows = rows[existing]
+        np.subtract.at(self._color_counts, (student_codes[existing], self._color_col[old_rows]), 1)
+        self._color_col[old_rows] = color_codes[existing]
+
+        new = ~existing
+        if new.any():
+            new_rows = self._append_rows(student_codes[new], days[new])
+            self._color_col[new_rows] = color_codes[new]
+            self._index.add_many(keys[new], new_rows)
+        np.add.at(self._color_counts, (student_codes, color_codes), 1)
+
+        self._invalidate()
+        touched = [self._students[code] for code in np.unique(student_codes)]
+        self._bump_version(*touched, since=days.min())
+
+        if self.store is not None:
+            self.store.upsert_entries(
+                (self._students[code], str(day), self.color_names[color])
+                for code, day, color in zip(student_codes.tolist(), days, color_codes.tolist()))
+        return len(keys)
+
+    @timed
+    def snapshot(self, build_views=True):
+        """Returns a read-only copy of the current data that later writes do not affect.
+
+        The copy shares nothing mutable with this manager and has no durable
+        store, and its DataFrame views are built up front, so any number of
+        threads can read from it at once without locking. With
+        build_views=False they are left to be built on first read, which
+        makes the copy cheap but only safe to read from one thread.
+        """
+        snap = DataManager(tracker=self.tracker)
+        if self._students is not None:
+            snap._students = list(self._students)
+            snap._student_codes = dict(self._student_codes)
+            snap._student_col = self._student_col[:self._size].copy()
+            snap._color_col = self._color_col[:self._size].copy()
+            snap._date_col = self._date_col[:self._size].copy()
+            snap._size = self._size
+            snap._index = self._index.copy()
+            snap._order = self._order[:self._order_len].copy() if self._order is not None else None
+            snap._order_len = self._order_len
+            snap._color_counts = self._color_counts.copy()
+            if build_views:
+                snap.behavior_data # Builds the cached views
+            snap._download = self._download
+        snap._version = self._version
+        snap._student_versions = dict(self._student_versions)
+        snap._change_log = deque(self._change_log, maxlen=self.CHANGE_LOG_SIZE)
+        snap.last_load_issues = list(self.last_load_issues)
+        snap.last_merge_conflicts = self.last_merge_conflicts
+        return snap
+
+    @timed
     def get_student_behavior_data(self, student_name):
-        """Gets all valid behavior data for a specific student."""
-        if self.behavior_data is None:
+        """Gets all valid behavior data for a specific student.
+
+        The frame is cached until the student's data changes and returned as
+        a copy-on-write view, so repeated calls copy nothing.
+        """
+        if self._students is None:
             return pd.DataFrame()
-        
-        student_data = self.behavior_data[
-            (self.behavior_data['student'] == student_name) &
-            (self.behavior_data['date'].notna())
-        ].copy()
-        
-        if not student_data.empty:
-            student_data['date'] = pd.to_datetime(student_data['date'])
-        
-        return student_data
 
+        student_code = self._student_codes.get(student_name)
+        if student_code is None:
+            return self._rows_to_frame(np.empty(0, dtype=np.intp))
+
+        version = self.get_student_version(student_name)
+        cached = self._student_frames.get(student_name)
+        if cached is None or cached[0] != version:
+            rows = np.flatnonzero(self._student_col[:self._size] == student_code)
+            cached = (version, self._rows_to_frame(rows))
+            self._student_frames[student_name] = cached
+        return cached[1].copy(deep=False)
+
+    def get_color_counts(self, student_name):
+        """Returns a Series of the student's number of entries per color, in color order."""
+        student_code = self._student_codes.get(student_name)
+        counts = self._color_counts[student_code, :-1] if student_code is not None else 0
+        return pd.Series(counts, index=self.color_names, dtype='int64')
+
+    def get_days_recorded(self, student_name):
+        """Returns how many days have an entry for the student."""
+        student_code = self._student_codes.get(student_name)
+        return int(self._color_counts[student_code].sum()) if student_code is not None else 0
+
+    @timed
+    def get_points_summary(self, student_name):
+        """Returns the student's points summary from the running color counts."""
+        return self.tracker.summarize_color_counts(self.get_color_counts(student_name), self.get_days_recorded(student_name))
+
+    def memory_bytes(self):
+        """Returns an estimate of the memory held by the store, its cached views
+        and any durable store's own in-memory copy."""
+        arrays = (self._student_col, self._color_col, self._date_col, self._color_counts, self._order)
+        total = sum(array.nbytes for array in arrays if array is not None)
+        # A dict entry (hash, key and value) costs roughly 100 bytes
+        total += self._index.nbytes + 100 * len(self._student_codes)
+        frames = [self._frame, self._entries_frame] + [frame for _, frame in self._student_frames.values()]
+        total += sum(int(frame.memory_usage(index=True).sum()) for frame in frames if frame is not None)
+        if self.store is not None:
+            total += self.store.memory_bytes()
+        return total
+
+    def get_version(self):
+        """Returns the global data version, which increases on every write."""
+        return self._version
+
+    def get_changes_since(self, version):
+        """Returns the earliest day (datetime64[D]) changed by writes after `version`.
+
+        Returns None if nothing has changed, and ANY_DAY if a write may have
+        touched any day (an upload or clear) or `version` is too old to tell.
+        """
+        if version >= self._version:
+            return None
+        if not self._change_log or self._change_log[0][0] > version + 1:
+            return self.ANY_DAY
+        return min(since for logged_version, since in self._change_log if logged_version > version)
+
+    def get_student_version(self, student_name):
+        """Returns the version of the last write that touched this student."""
+        return self._student_versions.get(student_name, 0)
+
+    @timed
     def get_all_behavior_data(self):
-        """Returns the entire in-memory DataFrame, excluding placeholder rows."""
-        if self.behavior_data is not None:
-            return self.behavior_data[self.behavior_data['date'].notna()].copy()
+        """Returns the entire in-memory DataFrame in date order, excluding placeholder rows.
+
+        This is a copy-on-write view of the cached frame, not a copy of the data.
+        """
+        if self._students is not None:
+            return self._sorted_entries().copy(deep=False)
         return pd.DataFrame()
 
+    @timed
+    def get_range(self, start_date=None, end_date=None, students=None):
+        """Returns the entries dated within [start_date, end_date], in date order.
+
+        The range is located by binary search over the date-sorted entries and
+        returned as a slice of them rather than a filtered copy of everything.
+        Either bound may be None for an open range; `students` optionally
+        restricts the result to a list of student names. Treat the result as
+        read-only.
+        """
+        if self._students is None:
+            return pd.DataFrame()
+
+        entries = self._sorted_entries()
+        lo = 0 if start_date is None else np.searchsorted(self._sorted_days, self._to_day(start_date), side='left')
+        hi = len(entries) if end_date is None else np.searchsorted(self._sorted_days, self._to_day(end_date), side='right')
+        in_range = entries.iloc[lo:hi]
+
+        if students is not None:
+            student_codes = [self._student_codes[name] for name in students if name in self._student_codes]
+            in_range = in_range[np.isin(in_range['student'].cat.codes.to_numpy(), student_codes)]
+        return in_range
+
+    @timed
+    def get_color_matrix(self, start_date=None, end_date=None):
+        """Returns a students x dates DataFrame of color codes for [start_date, end_date].
+
+        Rows are the whole roster in order and columns are the dates that
+        have at least one entry in the range. Values are the color's index
+        in BehaviorTracker order (as from get_color_value), or NaN where the
+        student has no entry that day.
+        """
+        if self._students is None:
+            return pd.DataFrame()
+
+        in_range = self.get_range(start_date, end_date)
+        days, day_positions = np.unique(in_range['date'].to_numpy(), return_inverse=True)
+        matrix = np.full((len(self._students), len(days)), np.nan)
+        matrix[in_range['student'].cat.codes.to_numpy(), day_positions] = in_range['color'].cat.codes.to_numpy()
+        matrix[matrix == self.NO_COLOR] = np.nan
+        return pd.DataFrame(matrix, index=pd.Index(self._students, name='student'), columns=pd.DatetimeIndex(days, name='date'))
+
+    @timed
+    def get_color_codes_since(self, since):
+        """Returns (days, codes) for the entries dated on or after `since` (a datetime64[D]).
+
+        `days` are the dates with at least one such entry, in order, and
+        `codes` is an int8 students x days array of color codes, NO_COLOR
+        where the student has no entry that day. Read straight from the
+        column arrays, so asking for the last few days does not build the
+        entry frames that get_color_matrix slices.
+        """
+        if self._students is None:
+            return np.empty(0, dtype='datetime64[D]'), np.empty((0, 0), dtype=np.int8)
+
+        dates = self._date_col[:self._size]
+        rows = np.flatnonzero(dates >= since)
+        days, day_positions = np.unique(dates[rows], return_inverse=True)
+        codes = np.full((len(self._students), len(days)), self.NO_COLOR, dtype=np.int8)
+        codes[self._student_col[rows], day_positions] = self._color_col[rows]
+        return days, codes
+
+    @timed
     def get_data_for_download(self):
-        """Prepares the data for download by cleaning it and returning as CSV bytes."""
-        if self.behavior_data is None:
+        """Prepares the data for download by cleaning it and returning as CSV bytes.
+
+        The bytes are cached until the next write, so asking again for
+        unchanged data does not serialize it again.
+        """
+        if self._students is None:
             return None
-        # Return a clean version without placeholder rows
-        clean_df = self.behavior_data[self.behavior_data['date'].notna()].copy()
-        return clean_df.to_csv(index=False).encode('utf-8')
+        if self._download is None or self._download[0] != self._version:
+            # Return a clean version without placeholder rows, with plain string columns
+            entries = self.get_all_behavior_data()
+            clean_df = entries.assign(date=entries['date'].dt.strftime('%Y-%m-%d'))
+            self._download = (self._version, clean_df.to_csv(index=False).encode('utf-8'))
+        return self._download[1]
 
+    @timed
     def clear_student_data(self, student_name):
         """Clears behavior data for a specific student in the current session."""
-        if self.behavior_data is not None:
-            # We just nullify their date/color entries, keeping the student record
-            self.behavior_data.loc[self.behavior_data['student'] == student_name, ['date', 'color']] = [pd.NaT, None]
+        if self._students is not None:
+            # We just drop their date/color entries, keeping the student record
+            student_code = self._student_codes.get(student_name)
+            if student_code is not None:
+                self._keep_rows(self._student_col[:self._size] != student_code)
+                self._color_counts[student_code] = 0
+                self._bump_version(student_name)
+                if self.store is not None:
+                    self.store.delete_entries(student_name)
             return True
         return False
 
+    @timed
     def clear_all_data(self):
         """Clears all behavior data in the current session."""
-        if self.behavior_data is not None:
-            # Nullify all date/color entries, keeping the student names
-            self.behavior_data[['date', 'color']] = [pd.NaT, None]
+        if self._students is not None:
+            # Drop all date/color entries, keeping the student names
+            self._reset_rows()
+            self._bump_version(*self._students)
+            if self.store is not None:
+                self.store.delete_entries()
             return True
         return False
+
+    def can_undo(self):
+        """Whether the durable store keeps the history undo_last_change needs."""
+        return self.store is not None and self.store.supports_undo
+
+    @timed
+    def undo_last_change(self):
+        """Reverts the most recent entry, overwrite or clear.
+
+        Only stores that keep a history (see storage.JournalStore) can undo;
+        returns False otherwise or if there is nothing left to undo. The
+        reverted data is reloaded from the store.
+        """
+        if self.store is None or not self.store.undo():
+            return False
+        self._load_frame(self.store.load_frame())
+        return True
+
+    def _read_upload(self, uploaded_file):
+        """Reads and parses an uploaded file, reusing the parse of identical content.
+
+        Returns (roster, student codes, dates, color codes, issues), with
+        each row's student as an int32 code into the roster list, or False
+        if the columns are not in a recognized format. This compact form is
+        what the process-wide cache holds, bounded by PARSED_UPLOADS_BYTES.
+        """
+        # Set the uploaded file's internal pointer to the beginning
+        uploaded_file.seek(0)
+        content = uploaded_file.read()
+        is_csv = uploaded_file.name.lower().endswith('.csv')
+
+        key = ResultCache.key('parsed_upload', tuple(self.color_names), is_csv, hashlib.sha256(content).hexdigest())
+        parsed = _parsed_uploads.get(key)
+        if parsed is None:
+            parsed = self._parse_upload(content, is_csv)
+            nbytes = 0
+            if parsed is not False:
+                names, dates, color_codes, issues = parsed
+                roster = pd.unique(names).tolist()
+                student_codes = pd.Categorical(names, categories=roster).codes.astype(np.int32)
+                parsed = roster, student_codes, dates, color_codes, issues
+                # A cached name or issue string costs roughly 100 bytes
+                nbytes = student_codes.nbytes + dates.nbytes + color_codes.nbytes + 100 * (len(roster) + len(issues))
+            _parsed_uploads.put(key, parsed, nbytes)
+        return parsed
+
+    def _current_columns(self):
+        """Returns the store as (names, dates, color codes) in _load_columns
+        form, led by a placeholder row per student in roster order."""
+        roster = np.asarray(self._students, dtype=object)
+        return (np.concatenate([roster, roster[self._student_col[:self._size]]]),
+                np.concatenate([np.full(len(roster), np.datetime64('NaT'), dtype='datetime64[D]'), self._date_col[:self._size]]),
+                np.concatenate([np.full(len(roster), self.NO_COLOR, dtype=np.int8), self._color_col[:self._size]]))
+
+    @timed
+    def _parse_upload(self, content, is_csv):
+        """Parses and validates an uploaded file.
+
+        Returns (names, dates, color_codes, issues) arrays ready for
+        _load_columns, or False if the columns are not in a recognized format.
+        """
+        first_line = 2 # Line 1 is the header
+        if is_csv:
+            # Blank lines are read as empty rows, so row positions stay line
+            # numbers; only blank lines before the header need counting
+            body = content.lstrip(b'\r\n')
+            first_line += content[:len(content) - len(body)].count(b'\n')
+            chunks = pd.read_csv(io.BytesIO(body), dtype=str, chunksize=self.CSV_CHUNK_ROWS, skip_blank_lines=False)
+        else:
+            chunks = [pd.read_excel(io.BytesIO(content), engine=EXCEL_ENGINE)]
+
+        parts, issues = [], []
+        is_roster = None
+        for chunk in chunks:
+            if is_roster is None:
+                # Case 1: It's a fresh roster with just one column of names
+                # Case 2: It's an existing data file
+                is_roster = 'date' not in chunk.columns and 'color' not in chunk.columns
+                if not is_roster and not {'student', 'date', 'color'}.issubset(chunk.columns):
+                    return False
+            if is_roster:
+                names = chunk.iloc[:, 0].dropna().astype(str).to_numpy()
+                parts.append((names, np.full(len(names), np.datetime64('NaT'), dtype='datetime64[D]'),
+                              np.full(len(names), self.NO_COLOR, dtype=np.int8)))
+            else:
+                parts.append(self._normalize_chunk(chunk, first_line, issues))
+            first_line += len(chunk)
+
+        if not parts:
+            parts.append((np.empty(0, dtype=object), np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=np.int8)))
+        names, dates, color_codes = (np.concatenate(column) for column in zip(*parts))
+        return names, dates, color_codes, issues[:self.MAX_REPORTED_ISSUES] + (
+            [f"...and {len(issues) - self.MAX_REPORTED_ISSUES} more"] if len(issues) > self.MAX_REPORTED_ISSUES else [])
+
+    def _normalize_chunk(self, chunk, first_line, issues):
+        """Normalizes one chunk of a data file, appending problems to `issues`.
+
+        Returns (names, dates, color_codes) for the chunk. Invalid rows that
+        still name a student are kept as placeholders (no date/color), so the
+        student stays on the roster. Empty rows are dropped without a report.
+        """
+        students = chunk['student'].astype('string').str.strip()
+        raw_dates = chunk['date']
+        raw_colors = chunk['color'].astype('string').str.strip().str.title()
+        dates = pd.to_datetime(raw_dates, errors='coerce', format='mixed')
+
+        # Validate each distinct color once rather than every row
+        valid_colors = [color for color in raw_colors.dropna().unique() if self.tracker.validate_color(color)]
+        has_date, has_color = raw_dates.notna(), raw_colors.notna()
+
+        problems = [
+            ((students.isna() | (students == '')).to_numpy(dtype=bool), "missing student name"),
+            ((has_date & dates.isna()).to_numpy(dtype=bool), "unreadable date"),
+            ((has_color & ~raw_colors.isin(valid_colors)).to_numpy(dtype=bool), "unknown color"),
+            ((has_date & ~has_color).to_numpy(dtype=bool), "date without a color"),
+            ((~has_date & has_color).to_numpy(dtype=bool), "color without a date"),
+        ]
+        bad = chunk.isna().all(axis=1).to_numpy().copy() # Blank lines
+        chunk_issues = []
+        for mask, reason in problems:
+            chunk_issues.extend((first_line + position, reason) for position in np.flatnonzero(mask & ~bad))
+            bad |= mask
+        issues.extend(f"Line {line}: {reason}" for line, reason in sorted(chunk_issues))
+
+        named = ~problems[0][0]
+        names = students[named].to_numpy(dtype=object)
+        day_values = dates.to_numpy().astype('datetime64[D]')
+        day_values[bad] = np.datetime64('NaT')
+        color_codes = self.tracker.scheme.codes_from_names(raw_colors)
+        color_codes[bad] = self.NO_COLOR
+        return names, day_values[named], color_codes[named]
+
+    def _load_frame(self, df):
+        """Normalizes a student/date/color DataFrame into the column store."""
+        names = df['student'].astype(str).to_numpy(dtype=object)
+        dates = pd.to_datetime(df['date'], errors='coerce', format='mixed').to_numpy().astype('datetime64[D]')
+        colors = self.tracker.scheme.codes_from_names(df['color'])
+        self._load_columns(names, dates, colors)
+
+    def _load_columns(self, names, dates, colors):
+        """Replaces the store with normalized rows: names, datetime64[D] dates
+        (NaT for roster placeholders) and int8 color codes."""
+        roster = pd.unique(names).tolist()
+        student_codes = pd.Categorical(names, categories=roster).codes.astype(np.int32)
+        self._load_codes(roster, student_codes, dates, colors)
+
+    def _load_codes(self, roster, student_codes, dates, colors):
+        """_load_columns for rows whose students are already int32 codes into `roster`."""
+        # Rows without a date are roster placeholders; repeated (student, date)
+        # pairs keep the last color, matching the upsert semantics
+        has_date = ~np.isnat(dates)
+        student_codes, dates, colors = student_codes[has_date], dates[has_date], colors[has_date]
+        keys = self._pack_keys(student_codes, dates)
+        keep = np.flatnonzero(~pd.Series(keys).duplicated(keep='last').to_numpy())
+
+        # Store the rows in date order so the sorted order starts out as the identity
+        keep = keep[np.argsort(dates[keep], kind='stable')]
+
+        self._students = list(roster) # The roster may be shared with the upload cache
+        self._student_codes = {name: code for code, name in enumerate(roster)}
+        self._student_col = student_codes[keep]
+        self._color_col = colors[keep]
+        self._date_col = dates[keep]
+        self._size = len(self._student_col)
+        self._index = _KeyIndex(keys[keep])
+        self._order = np.arange(self._size, dtype=np.intp)
+        self._order_len = self._size
+        self._color_counts = self._count_colors(self._student_col, self._color_col, len(roster))
+        self._invalidate()
+        self._student_versions = {}
+        self._bump_version(*roster)
+
+    def _iter_entries(self):
+        """Yields (student, 'YYYY-MM-DD', color) tuples for every stored entry."""
+        dates = self._date_col[:self._size].astype(str)
+        for student_code, date_str, color_code in zip(self._student_col[:self._size].tolist(), dates, self._color_col[:self._size].tolist()):
+            if color_code != self.NO_COLOR:
+                yield self._students[student_code], str(date_str), self.color_names[color_code]
+
+    def _count_colors(self, student_codes, color_codes, n_students):
+        """Builds the (student, color) count matrix from the column arrays."""
+        n_columns = len(self.color_names) + 1
+        flat = student_codes.astype(np.int64) * n_columns + (color_codes.astype(np.int64) % n_columns)
+        return np.bincount(flat, minlength=n_students * n_columns).reshape(n_students, n_columns)
+
+    def _bump_version(self, *student_names, since=ANY_DAY):
+        """Advances the global version and marks the given students as changed.
+
+        `since` is the earliest day the write touched, if it only touched
+        days from then on.
+        """
+        self._version += 1
+        for student_name in student_names:
+            self._student_versions[student_name] = self._version
+        self._change_log.append((self._version, since))
+
+    def _invalidate(self):
+        """Drops the cached DataFrame views after a change to the store."""
+        self._frame = None
+        self._entries_frame = None
+        self._sorted_days = None
+
+    def _sorted_rows(self):
+        """Returns the row positions in date order, re-sorting only if stale."""
+        if self._order is None:
+            self._order = np.argsort(self._date_col[:self._size], kind='stable')
+            self._order_len = self._size
+        return self._order[:self._order_len]
+
+    def _sorted_entries(self):
+        """Returns the cached, date-sorted DataFrame of all entries."""
+        if self._entries_frame is None:
+            rows = self._sorted_rows()
+            self._sorted_days = self._date_col[rows]
+            self._entries_frame = self._rows_to_frame(rows)
+        return self._entries_frame
+
+    @timed
+    def _consolidate(self):
+        """Builds the DataFrame view of the column store."""
+        entries = self._sorted_entries()
+        counts = np.bincount(self._student_col[:self._size], minlength=len(self._students))
+        placeholder_codes = np.flatnonzero(counts == 0).astype(np.int32)
+        if len(placeholder_codes) == 0:
+            return entries
+
+        # Placeholder rows so students without entries stay on the roster
+        placeholders = pd.DataFrame({
+            'student': pd.Categorical.from_codes(placeholder_codes, categories=self._students),
+            'date': pd.Series(pd.NaT, index=range(len(placeholder_codes)), dtype=entries['date'].dtype),
+            'color': pd.Categorical.from_codes(np.full(len(placeholder_codes), self.NO_COLOR, dtype=np.int8), categories=self.color_names, ordered=True)
+        })
+        return pd.concat([entries, placeholders], ignore_index=True)
+
+    def _rows_to_frame(self, rows):
+        """Builds a student/date/color DataFrame from row positions in the store."""
+        return pd.DataFrame({
+            'student': pd.Categorical.from_codes(self._student_col[rows], categories=self._students),
+            'date': self._date_col[rows],
+            'color': pd.Categorical.from_codes(self._color_col[rows], categories=self.color_names, ordered=True)
+        }, columns=self.COLUMNS)
+
+    def _add_student(self, student_name):
+        student_code = len(self._students)
+        self._students.append(student_name)
+        self._student_codes[student_name] = student_code
+        self._student_frames = {} # Their student categories no longer cover the roster
+        self._color_counts = np.vstack([self._color_counts, np.zeros((1, self._color_counts.shape[1]), dtype=np.int64)])
+        return student_code
+
+    def _append_row(self, student_code, day):
+        """Appends a row to the column arrays, growing them geometrically."""
+        if self._size == len(self._student_col):
+            capacity = max(16, 2 * self._size)
+            self._student_col = np.resize(self._student_col, capacity)
+            self._color_col = np.resize(self._color_col, capacity)
+            self._date_col = np.resize(self._date_col, capacity)
+        row = self._size
+        self._student_col[row] = student_code
+        self._date_col[row] = day
+        self._size += 1
+
+        # Entries for the latest date keep the sorted order valid; anything
+        # older marks it stale so it is re-sorted on the next read
+        if self._order is not None:
+            if self._order_len and day < self._date_col[self._order[self._order_len - 1]]:
+                self._order = None
+            else:
+                if self._order_len == len(self._order):
+                    self._order = np.resize(self._order, max(16, 2 * self._order_len))
+                self._order[self._order_len] = row
+                self._order_len += 1
+        return row
+
+    def _append_rows(self, student_codes, days):
+        """Appends a block of rows to the column arrays; returns their positions."""
+        count = len(student_codes)
+        if self._size + count > len(self._student_col):
+            capacity = max(16, 2 * self._size, self._size + count)
+            self._student_col = np.resize(self._student_col, capacity)
+            self._color_col = np.resize(self._color_col, capacity)
+            self._date_col = np.resize(self._date_col, capacity)
+        rows = np.arange(self._size, self._size + count, dtype=np.intp)
+        self._student_col[rows] = student_codes
+        self._date_col[rows] = days
+        self._size += count
+
+        # As in _append_row: the sorted order stays valid if nothing is older
+        # than its current last date
+        if self._order is not None:
+            if self._order_len and days.min() < self._date_col[self._order[self._order_len - 1]]:
+                self._order = None
+            else:
+                if self._order_len + count > len(self._order):
+                    self._order = np.resize(self._order, max(16, 2 * self._order_len, self._order_len + count))
+                self._order[self._order_len:self._order_len + count] = rows[np.argsort(days, kind='stable')]
+                self._order_len += count
+        return rows
+
+    def _keep_rows(self, keep_mask):
+        """Compacts the store down to the rows selected by keep_mask."""
+        self._student_col = self._student_col[:self._size][keep_mask]
+        self._color_col = self._color_col[:self._size][keep_mask]
+        self._date_col = self._date_col[:self._size][keep_mask]
+        self._size = len(self._student_col)
+        keys = self._pack_keys(self._student_col, self._date_col)
+        self._index = _KeyIndex(keys)
+        self._order = None
+        self._invalidate()
+
+    def _reset_rows(self):
+        self._student_col = np.empty(0, dtype=np.int32)
+        self._color_col = np.empty(0, dtype=np.int8)
+        self._date_col = np.empty(0, dtype='datetime64[D]')
+        self._size = 0
+        self._index = _KeyIndex()
+        self._order = np.empty(0, dtype=np.intp)
+        self._order_len = 0
+        self._color_counts = np.zeros((len(self._students or []), len(self.color_names) + 1), dtype=np.int64)
+        self._invalidate()
+
+    @staticmethod
+    def _pack_key(student_code, day):
+        """Packs a (student code, day) pair into a single int key."""
+        return (int(student_code) << 32) | (int(day.astype(np.int64)) & 0xFFFFFFFF)
+
+    @staticmethod
+    def _pack_keys(student_codes, days):
+        """Vectorized _pack_key over arrays of student codes and days."""
+        return (student_codes.astype(np.int64) << 32) | (days.astype(np.int64) & 0xFFFFFFFF)
+
+    @staticmethod
+    def _to_day(date_value):
+        """Normalizes a date (string, date or Timestamp) to a datetime64[D]."""
+        if date_value is None or (not isinstance(date_value, str) and pd.isna(date_value)):
+            return None
+        try:
+            return np.datetime64(pd.Timestamp(date_value).date(), 'D')
+        except (ValueError, TypeError):
+            return None
@@ -0,0 +1,132 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# Set BEHAVIOR_PROFILE=1 to record timing spans. When it is off, `timed`
+# returns functions undecorated and `span` hands back one shared no-op
+# context manager, so instrumented code runs as if it were not instrumented.
+ENABLED = os.environ.get('BEHAVIOR_PROFILE', '').lower() in ('1', 'true', 'yes', 'on')
+
+MAX_EVENTS = 20000 # Spans kept for trace export
+MAX_SAMPLES = 1000 # Durations kept per span name for percentiles
+
+_NO_SPAN = nullcontext()
+_current_rerun = contextvars.ContextVar('current_rerun', default=None)
+
+
+class SpanRecorder:
+    """Thread-safe store of finished timing spans.
+
+    Keeps the most recent spans for trace export and a bounded window of
+    durations per span name for percentiles, so memory stays flat however
+    long the server runs.
+    """
+
+    def __init__(self, max_events=MAX_EVENTS, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._events = deque(maxlen=max_events)
+        self._durations = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def add(self, name, start, duration):
+        event = (name, start - self._origin, duration, threading.get_ident())
+        with self._lock:
+            self._events.append(event)
+            samples = self._durations.get(name)
+            if samples is None:
+                samples = self._durations[name] = deque(maxlen=self.max_samples)
+            samples.append(duration)
+        rerun = _current_rerun.get()
+        if rerun is not None:
+            rerun.append((name, duration))
+
+    def summary(self):
+        """Returns one dict per span name with count and p50/p95/max/total in milliseconds."""
+        with self._lock:
+            durations = {name: np.fromiter(samples, dtype=float) for name, samples in self._durations.items()}
+        rows = []
+        for name, values in durations.items():
+            values = values * 1000
+            rows.append({'span': name, 'count': len(values), 'p50_ms': float(np.percentile(values, 50)),
+                         'p95_ms': float(np.percentile(values, 95)), 'max_ms': float(values.max()),
+                         'total_ms': float(values.sum())})
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def to_json(self):
+        """Returns the summary and the recorded spans as JSON bytes."""
+        with self._lock:
+            events = list(self._events)
+        spans = [{'span': name, 'start_ms': start * 1000, 'duration_ms': duration * 1000, 'thread': thread}
+                 for name, start, duration, thread in events]
+        return json.dumps({'summary': self.summary(), 'spans': spans}, indent=2).encode('utf-8')
+
+    def to_chrome_trace(self):
+        """Returns the recorded spans in Chrome's trace event format (chrome://tracing, Perfetto)."""
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        trace = [{'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6, 'pid': pid, 'tid': thread}
+                 for name, start, duration, thread in events]
+        return json.dumps({'traceEvents': trace, 'displayTimeUnit': 'ms'}).encode('utf-8')
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._durations.clear()
+
+
+recorder = SpanRecorder()
+
+
+@contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, start, time.perf_counter() - start)
+
+
+def span(name):
+    """Context manager that records how long its block takes under `name`."""
+    return _span(name) if ENABLED else _NO_SPAN
+
+
+def timed(func=None, name=None):
+    """Decorator that records each call as a span named after the function.
+
+    Use as @timed or @timed(name='...'). Returns the function unchanged
+    when profiling is off.
+    """
+    if func is None:
+        return functools.partial(timed, name=name)
+    if not ENABLED:
+        return func
+    span_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.add(span_name, start, time.perf_counter() - start)
+    return wrapper
+
+
+def start_rerun():
+    """Starts collecting the spans of one script run in the current context.
+
+    Returns the list they are appended to, as (name, seconds) tuples.
+    """
+    spans = []
+    _current_rerun.set(spans)
+    return spans
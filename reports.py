@@ -0,0 +1,454 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+import svg_charts
+from profiling import timed
+from result_cache import ResultCache
+
+# Rendering of the printable and Excel reports. Everything here works on
+# plain data (no Streamlit session state), so student sections can be
+# rendered in worker processes and assembled afterwards. Plotly and
+# xlsxwriter are imported inside the functions that use them, so importing
+# this module at app startup stays cheap.
+
+RECENT_ENTRIES = 10 # Entries shown on a student's timeline
+
+# Executor used for parallel rendering: 'process', 'thread' or 'serial'
+REPORT_EXECUTOR = os.environ.get('REPORT_EXECUTOR', 'process')
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', min(4, os.cpu_count() or 1)))
+# Below this many sections the pool overhead outweighs the gain
+PARALLEL_MIN_SECTIONS = 4
+
+# Rows fetched at a time when streaming raw entries into a workbook
+EXCEL_ENTRY_CHUNK = 10000
+# Exports with more entries than this are written in constant-memory mode
+STREAMING_EXPORT_ROWS = 50000
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def student_report_payload(data_manager, tracker, student_name, recent_entries=RECENT_ENTRIES):
+    """Collects everything needed to render one student's report section.
+
+    The payload is a plain dict of picklable values, so it can be shipped to
+    a worker process. `recent_entries` sets how many of the latest entries
+    go on the timeline.
+    """
+    student_data = data_manager.get_student_behavior_data(student_name)
+    recent_data = student_data.sort_values('date', ascending=False).head(recent_entries)
+    return {
+        'student_name': student_name,
+        'colors': dict(tracker.get_color_options()),
+        'color_counts': data_manager.get_color_counts(student_name).to_dict(),
+        'days_recorded': data_manager.get_days_recorded(student_name),
+        'points_summary': data_manager.get_points_summary(student_name),
+        'recent_dates': recent_data['date'].tolist(),
+        'recent_colors': recent_data['color'].astype(str).tolist(),
+    }
+
+
+def timeline_figure(dates, entry_colors, colors):
+    """Builds the recent behavior timeline as a single Plotly marker trace.
+
+    Each entry is one point, colored from the `colors` palette, on a y axis
+    that lists every color (the first color at the bottom) whether or not it
+    occurs. Entries with unknown colors are left out. Used by both the
+    dashboard and the printable report.
+    """
+    import plotly.graph_objects as go
+
+    color_names = list(colors.keys())
+    color_codes = pd.Categorical(np.asarray(entry_colors, dtype=object), categories=color_names).codes
+    known = color_codes >= 0
+    dates = np.asarray(dates)[known]
+    color_codes = color_codes[known]
+    fig = go.Figure(go.Scatter(
+        x=dates, y=color_codes, mode='markers', showlegend=False,
+        text=np.asarray(color_names, dtype=object)[color_codes],
+        hovertemplate="%{x|%m/%d/%Y}: %{text}<extra></extra>",
+        marker=dict(size=15, color=np.asarray(list(colors.values()), dtype=object)[color_codes], line=dict(width=2, color='black'))))
+    fig.update_layout(xaxis_title="Date", yaxis=dict(tickmode='array', tickvals=list(range(len(color_names))),
+                                                    ticktext=color_names, range=[-0.5, len(color_names) - 0.5]))
+    return fig
+
+
+def class_heatmap_figure(color_matrix, colors):
+    """Builds a students x dates heatmap from DataManager.get_color_matrix.
+
+    Each cell takes its color's palette hex through a stepped colorscale,
+    so the whole class is one Heatmap trace.
+    """
+    import plotly.graph_objects as go
+
+    color_names = list(colors.keys())
+    n_colors = len(color_names)
+    colorscale = []
+    for i, hex_code in enumerate(colors.values()):
+        colorscale += [[i / n_colors, hex_code], [(i + 1) / n_colors, hex_code]]
+
+    codes = color_matrix.to_numpy()
+    labels = np.where(np.isnan(codes), "", np.asarray(color_names, dtype=object)[np.nan_to_num(codes).astype(int)])
+    fig = go.Figure(go.Heatmap(
+        z=codes, x=color_matrix.columns.strftime('%m/%d/%Y'), y=color_matrix.index.astype(str), text=labels,
+        zmin=-0.5, zmax=n_colors - 0.5, colorscale=colorscale, xgap=1, ygap=1,
+        hovertemplate="%{y}, %{x}: %{text}<extra></extra>",
+        colorbar=dict(tickmode='array', tickvals=list(range(n_colors)), ticktext=color_names)))
+    # Dates go on a category axis so days without entries (weekends) leave no gaps
+    fig.update_layout(xaxis=dict(title="Date", type='category'), yaxis=dict(type='category', autorange='reversed'),
+                      height=max(300, 22 * len(color_matrix) + 120), margin=dict(l=10, r=10, t=10, b=10))
+    return fig
+
+
+def render_student_section(payload):
+    """Renders one student's section of the printable report as HTML with interactive Plotly charts."""
+    import plotly.express as px
+
+    student_name = payload['student_name']
+    points_summary = payload['points_summary']
+    # Fixed div ids (instead of Plotly's random ones) keep the output deterministic
+    div_prefix = "chart-" + hashlib.md5(student_name.encode('utf-8')).hexdigest()[:12]
+
+    pie_chart_html = "<h4>Behavior Distribution</h4><p>No data to display.</p>"
+    bar_chart_html = "<h4>Behavior Percentages</h4><p>No data to display.</p>"
+    timeline_html = "<h4>Recent Behavior</h4><p>No data to display.</p>"
+
+    if payload['days_recorded'] > 0:
+        colors = payload['colors']
+        color_names = list(colors.keys())
+        color_counts = payload['color_counts']
+        total_entries = payload['days_recorded']
+        percentages = {color: (color_counts.get(color, 0) / total_entries) * 100 for color in color_names}
+
+        # --- Generate Pie Chart ---
+        fig_pie = px.pie(values=list(percentages.values()), names=color_names, color=color_names, color_discrete_map=colors)
+        fig_pie.update_layout(showlegend=False, width=300, height=300, margin=dict(l=10, r=10, t=10, b=10))
+        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+        pie_chart_html = f"<h4>Behavior Distribution</h4>{fig_pie.to_html(full_html=False, include_plotlyjs='cdn', div_id=f'{div_prefix}-pie')}"
+
+        # --- Generate Bar Chart ---
+        fig_bar = px.bar(x=color_names, y=[percentages[c] for c in color_names], color=color_names, color_discrete_map=colors)
+        fig_bar.update_layout(showlegend=False, width=300, height=300, margin=dict(l=10, r=10, t=10, b=10), yaxis_title="Percentage (%)")
+        bar_chart_html = f"<h4>Behavior Percentages</h4>{fig_bar.to_html(full_html=False, include_plotlyjs='cdn', div_id=f'{div_prefix}-bar')}"
+
+        # --- Generate Timeline Chart ---
+        fig_timeline = timeline_figure(payload['recent_dates'], payload['recent_colors'], colors)
+        fig_timeline.update_layout(width=650, height=300, margin=dict(l=10, r=10, t=10, b=10))
+        timeline_html = f"<h4>Recent Behavior Timeline</h4>{fig_timeline.to_html(full_html=False, include_plotlyjs='cdn', div_id=f'{div_prefix}-timeline')}"
+
+    return _section_html(student_name, points_summary, pie_chart_html, bar_chart_html, timeline_html)
+
+
+def render_student_section_static(payload):
+    """Renders one student's section of the printable report as HTML with inline SVG charts."""
+    student_name = payload['student_name']
+    points_summary = payload['points_summary']
+
+    pie_chart_html = "<h4>Behavior Distribution</h4><p>No data to display.</p>"
+    bar_chart_html = "<h4>Behavior Percentages</h4><p>No data to display.</p>"
+    timeline_html = "<h4>Recent Behavior</h4><p>No data to display.</p>"
+
+    if payload['days_recorded'] > 0:
+        colors = payload['colors']
+        color_counts = payload['color_counts']
+        total_entries = payload['days_recorded']
+        percentages = {color: (color_counts.get(color, 0) / total_entries) * 100 for color in colors}
+
+        pie_chart_html = f"<h4>Behavior Distribution</h4>{svg_charts.pie_svg(color_counts, colors)}"
+        bar_chart_html = f"<h4>Behavior Percentages</h4>{svg_charts.bar_svg(percentages, colors)}"
+        timeline_svg = svg_charts.timeline_svg(payload['recent_dates'], payload['recent_colors'], colors)
+        timeline_html = f"<h4>Recent Behavior Timeline</h4>{timeline_svg}"
+
+    return _section_html(student_name, points_summary, pie_chart_html, bar_chart_html, timeline_html)
+
+
+# Section renderers by report style
+REPORT_STYLES = {
+    'static': render_student_section_static,
+    'interactive': render_student_section,
+}
+
+
+@timed
+def render_student_sections(payloads, workers=None, executor=None, style='interactive'):
+    """Renders report sections for a list of payloads, returned in the same order.
+
+    `style` picks the section renderer from REPORT_STYLES: 'interactive'
+    (Plotly) or 'static' (inline SVG, no JavaScript).
+
+    Sections are rendered concurrently in a process (or thread) pool with
+    `workers` workers. Each section is rendered independently and results are
+    collected in input order, so the output is identical to serial
+    rendering. Small batches, workers <= 1, executor='serial', or a pool that
+    cannot be started all fall back to rendering serially.
+    """
+    payloads = list(payloads)
+    render = REPORT_STYLES[style]
+    workers = REPORT_WORKERS if workers is None else workers
+    executor = REPORT_EXECUTOR if executor is None else executor
+
+    if executor == 'serial' or workers <= 1 or len(payloads) < PARALLEL_MIN_SECTIONS:
+        return [render(payload) for payload in payloads]
+
+    try:
+        pool = _get_pool(executor, workers)
+        chunksize = max(1, len(payloads) // (workers * 4))
+        return list(pool.map(render, payloads, chunksize=chunksize))
+    except (BrokenProcessPool, OSError, RuntimeError):
+        _discard_pool(executor, workers)
+        return [render(payload) for payload in payloads]
+
+
+@timed
+def printable_report_html(data_manager, tracker, students, style='interactive', cache=None, workers=None, executor=None):
+    """Builds the printable report for the given students, in roster order.
+
+    With a ResultCache as `cache`, each student's section is cached against
+    their data version, so only students changed since the last report are
+    rendered again. The rest are rendered in parallel (see
+    render_student_sections) and slotted back in order.
+    """
+    keys = [ResultCache.key(f'student_report_html_{style}', student_name, version=data_manager.get_student_version(student_name))
+            for student_name in students]
+    sections = [cache.get(key) for key in keys] if cache is not None else [None] * len(students)
+    missing = [i for i, section in enumerate(sections) if section is None]
+
+    payloads = [student_report_payload(data_manager, tracker, students[i]) for i in missing]
+    for i, section in zip(missing, render_student_sections(payloads, workers=workers, executor=executor, style=style)):
+        if cache is not None:
+            cache.put(keys[i], section)
+        sections[i] = section
+
+    return assemble_printable_html(sections)
+
+
+def assemble_printable_html(sections):
+    """Wraps rendered student sections in the printable report document."""
+    all_student_html = "".join(sections)
+    full_html = f"""
+    <html><head><title>Behavior Report</title><style>
+        @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@400;600&display=swap');
+        body {{ font-family: 'Poppins', sans-serif; padding: 20px; }}
+        .student-report {{ page-break-inside: avoid; border: 1px solid #ccc; border-radius: 10px; padding: 15px; margin-bottom: 20px; }}
+        h1 {{ text-align: center; }} h2 {{ border-bottom: 2px solid #eee; padding-bottom: 5px; }} h4 {{ text-align: center; margin-top: 0; }}
+        .top-row, .bottom-row {{ display: flex; align-items: center; justify-content: space-around; margin-bottom: 15px; }}
+        .summary-table, .chart-cell {{ flex: 1; padding: 10px; text-align: center; }}
+        .chart-cell.timeline {{ flex: 2; }}
+        table {{ width: 100%; border-collapse: collapse; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+        th {{ background-color: #f2f2f2; }}
+    </style></head><body>
+        <h1>Behavior Report</h1>
+        {all_student_html}
+    </body></html>
+    """
+    return full_html
+
+
+def iter_student_summaries(data_manager, tracker, students, start_date, end_date):
+    """Yields (student_name, points summary) in roster order for a date range.
+
+    The summary is None for students with no entries in the range.
+    """
+    summaries = tracker.summarize_points(data_manager.get_range(start_date, end_date))
+    for student_name in students:
+        if student_name in summaries.index:
+            yield student_name, tracker.summary_for_student(summaries, student_name)
+        else:
+            yield student_name, None
+
+
+def iter_entry_rows(data_manager, start_date, end_date, chunk_size=EXCEL_ENTRY_CHUNK):
+    """Yields (date, student, color) string tuples for the entries in a date range, in date order."""
+    range_data = data_manager.get_range(start_date, end_date)
+    for lo in range(0, len(range_data), chunk_size):
+        chunk = range_data.iloc[lo:lo + chunk_size]
+        yield from zip(chunk['date'].dt.strftime('%m/%d/%Y'), chunk['student'].astype(str), chunk['color'].astype(str))
+
+
+def write_excel_report(workbook, student_summaries, start_date, end_date, entry_rows=None):
+    """Writes the behavior report into an open xlsxwriter workbook.
+
+    `student_summaries` is an iterable of (student_name, summary or None) as
+    produced by iter_student_summaries. If `entry_rows` is given, a second
+    "Daily Entries" sheet lists them. Rows are written strictly top to
+    bottom, so this also works with constant_memory workbooks.
+    """
+    worksheet = workbook.add_worksheet("Behavior Report")
+
+    # --- Formatting ---
+    title_format = workbook.add_format({'bold': True, 'font_size': 16, 'align': 'center', 'valign': 'vcenter'})
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'border': 1, 'align': 'center', 'valign': 'vcenter'})
+    cell_format = workbook.add_format({'align': 'center', 'valign': 'vcenter'})
+
+    # --- Write Titles and Headers ---
+    worksheet.set_column('A:A', 20)
+    worksheet.set_column('B:E', 15)
+    worksheet.merge_range('A1:E1', 'Behavior Report', title_format)
+    date_range_str = f"Date Range: {start_date.strftime('%m/%d/%Y')} to {end_date.strftime('%m/%d/%Y')}"
+    worksheet.merge_range('A2:E2', date_range_str, workbook.add_format({'align': 'center'}))
+
+    headers = ["Student Name", "Good Points", "Bad Points", "Good Behavior %", "Days Recorded"]
+    worksheet.write_row('A4', headers, header_format)
+
+    # --- Write Data for Each Student ---
+    row_num = 4
+    for student_name, points_summary in student_summaries:
+        worksheet.write(row_num, 0, student_name, cell_format)
+
+        if points_summary is None:
+            worksheet.merge_range(row_num, 1, row_num, 4, "No data for this period", cell_format)
+            row_num += 1
+            continue
+
+        worksheet.write(row_num, 1, points_summary['total_good_points'], cell_format)
+        worksheet.write(row_num, 2, points_summary['total_bad_points'], cell_format)
+        worksheet.write(row_num, 3, f"{points_summary['good_percentage']}%", cell_format)
+        worksheet.write(row_num, 4, points_summary['days_recorded'], cell_format)
+
+        row_num += 1
+
+    # --- Optional Sheet With Raw Daily Entries ---
+    if entry_rows is not None:
+        entries_sheet = workbook.add_worksheet("Daily Entries")
+        entries_sheet.set_column('A:C', 18)
+        entries_sheet.write_row(0, 0, ["Date", "Student Name", "Color"], header_format)
+        for row_num, row in enumerate(entry_rows, start=1):
+            entries_sheet.write_row(row_num, 0, row)
+
+
+@timed
+def build_excel_report(data_manager, tracker, students, start_date, end_date, include_entries=False):
+    """Builds the Excel report in memory and returns its bytes, or None if the range has no data."""
+    import xlsxwriter
+
+    if data_manager.get_range(start_date, end_date).empty:
+        return None
+
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    entry_rows = iter_entry_rows(data_manager, start_date, end_date) if include_entries else None
+    write_excel_report(workbook, iter_student_summaries(data_manager, tracker, students, start_date, end_date),
+                       start_date, end_date, entry_rows)
+    workbook.close()
+    return output.getvalue()
+
+
+@timed
+def stream_excel_report(data_manager, tracker, students, start_date, end_date, include_entries=True, path=None):
+    """Writes the Excel report to a file using xlsxwriter's constant_memory mode.
+
+    Summaries and raw entries are fed from generators and each row is
+    flushed to disk once written, so memory stays flat no matter how many
+    students or days are exported. Writes to a new temp file unless `path`
+    is given, and returns the path, or None if the range has no data.
+    """
+    if data_manager.get_range(start_date, end_date).empty:
+        return None
+
+    import xlsxwriter
+
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'tmpdir': tempfile.gettempdir()})
+    entry_rows = iter_entry_rows(data_manager, start_date, end_date) if include_entries else None
+    write_excel_report(workbook, iter_student_summaries(data_manager, tracker, students, start_date, end_date),
+                       start_date, end_date, entry_rows)
+    workbook.close()
+    return path
+
+
+@timed
+def excel_report_file(data_manager, tracker, students, start_date, end_date, include_entries=False):
+    """Writes the Excel report to a new temp file and returns its path, or None if the range has no data.
+
+    Large exports (more than STREAMING_EXPORT_ROWS entries, or any with
+    every daily entry) are streamed, so the workbook is never held in
+    memory while it is built; smaller ones are built in memory and written
+    out. The caller owns the file; hold it in a ReportFile to have it removed.
+    """
+    if include_entries or len(data_manager.get_range(start_date, end_date)) > STREAMING_EXPORT_ROWS:
+        return stream_excel_report(data_manager, tracker, students, start_date, end_date, include_entries)
+    report = build_excel_report(data_manager, tracker, students, start_date, end_date)
+    if report is None:
+        return None
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(report)
+    return path
+
+
+class ReportFile:
+    """A finished report in a temp file, such as from excel_report_file.
+
+    The file is removed by discard(), or failing that when the object is
+    garbage collected or the process exits, so a report held by a session
+    that is closed or expires does not stay on disk.
+    """
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name # File name to offer for download
+        self.discard = weakref.finalize(self, _remove_file, path)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _section_html(student_name, points_summary, pie_chart_html, bar_chart_html, timeline_html):
+    return f"""
+    <div class="student-report">
+        <h2>{student_name}</h2>
+        <div class="top-row">
+            <div class="summary-table">
+                <h4>Point System Summary</h4>
+                <table>
+                    <tr><th>Category</th><th>Value</th></tr>
+                    <tr><td>Good Points</td><td>{points_summary['total_good_points']}</td></tr>
+                    <tr><td>Bad Points</td><td>{points_summary['total_bad_points']}</td></tr>
+                    <tr><td>Good Behavior %</td><td>{points_summary['good_percentage']}%</td></tr>
+                    <tr><td>Days Recorded</td><td>{points_summary['days_recorded']}</td></tr>
+                </table>
+            </div>
+            <div class="chart-cell">{pie_chart_html}</div>
+        </div>
+        <div class="bottom-row">
+            <div class="chart-cell">{bar_chart_html}</div>
+            <div class="chart-cell timeline">{timeline_html}</div>
+        </div>
+    </div>
+    """
+
+
+def _get_pool(executor, workers):
+    """Returns a long-lived pool for (executor, workers), creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get((executor, workers))
+        if pool is None:
+            if executor == 'thread':
+                pool = ThreadPoolExecutor(max_workers=workers)
+            else:
+                # 'spawn' avoids forking the (multi-threaded) Streamlit server
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pools[(executor, workers)] = pool
+        return pool
+
+
+def _discard_pool(executor, workers):
+    with _pools_lock:
+        pool = _pools.pop((executor, workers), None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
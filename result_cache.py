@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Bounded LRU cache for rendered charts and reports.
+
+    Keys are (artifact, student, date_range, version) tuples, where version
+    comes from DataManager.get_version() or get_student_version(). Since a
+    write bumps the version, stale results are never returned, and storing a
+    new version of an (artifact, student, date_range) drops the one it
+    supersedes, so each artifact holds at most one result per student and
+    range. Pass keep_versions=True when the last key part is not a data
+    version (a content hash, say) and every value should be kept.
+
+    With `max_bytes`, the cache is also bounded by the sizes given to put(),
+    evicting least recently used entries until their total fits.
+    """
+
+    def __init__(self, max_entries=1024, keep_versions=False, max_bytes=None):
+        self.max_entries = max_entries
+        self.keep_versions = keep_versions
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._latest = {} # key without its version -> newest key stored for it
+        self._sizes = {}  # key -> size in bytes given to put()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(artifact, student=None, date_range=None, version=0):
+        """Build a cache key for an artifact"""
+        return (artifact, student, date_range, version)
+
+    def get(self, key, default=None):
+        """Return a cached value and mark it as recently used"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, nbytes=0):
+        """Store a value of about `nbytes`, evicting the least recently used entries if full"""
+        with self._lock:
+            if not self.keep_versions:
+                superseded = self._latest.get(key[:-1])
+                if superseded is not None and superseded != key:
+                    self._drop(superseded)
+            self._drop(key)
+            self._entries[key] = value
+            self._sizes[key] = nbytes
+            self._bytes += nbytes
+            if not self.keep_versions:
+                self._latest[key[:-1]] = key
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._drop(next(iter(self._entries)))
+
+    def get_or_create(self, key, create):
+        """Return the cached value for key, calling create() to build it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = create()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self):
+        """Total of the sizes given to put() for the entries still cached"""
+        return self._bytes
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        self._bytes -= self._sizes.pop(key, 0)
+        if self._latest.get(key[:-1]) == key:
+            del self._latest[key[:-1]]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,111 @@
+import threading
+from contextlib import contextmanager
+from result_cache import ResultCache
+
+
+class ReadWriteLock:
+    """Lock that admits many readers or a single writer.
+
+    Writers take priority: once a writer is waiting, new readers queue
+    behind it, so a steady stream of reads cannot starve a write.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read_lock(self):
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class SharedDataManager:
+    """One class's DataManager shared by every session that opens the class.
+
+    Exposes the DataManager interface. Writes are applied to the single live
+    manager under the write lock, one at a time, so co-teachers editing the
+    same class never overwrite each other's changes. Reads are answered from
+    a snapshot of the data (see DataManager.snapshot), taken under the read
+    lock once per data version and then shared by all sessions, so readers
+    never block on each other and never see a half-applied write.
+
+    Rendered charts and reports are cached in `result_cache`, also shared,
+    so memory grows with the number of classes rather than open tabs.
+    """
+
+    WRITE_METHODS = ('load_data_from_file', 'merge_data_from_files', 'add_behavior_entry', 'add_behavior_entries',
+                     'clear_student_data', 'clear_all_data', 'undo_last_change')
+
+    def __init__(self, data_manager, result_cache=None):
+        self._manager = data_manager
+        self._lock = ReadWriteLock()
+        self._snapshot = None
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+
+    def snapshot(self):
+        """Returns a read-only DataManager with the latest committed data.
+
+        Hold on to it to read several things from the same version.
+        """
+        with self._lock.read_lock():
+            snap = self._snapshot
+            if snap is None or snap.get_version() != self._manager.get_version():
+                # Readers may race to build the same version; either copy is fine
+                snap = self._manager.snapshot()
+                self._snapshot = snap
+            return snap
+
+    def memory_bytes(self):
+        """Estimated memory of the live manager plus its current read snapshot."""
+        snap = self._snapshot
+        return self._manager.memory_bytes() + (snap.memory_bytes() if snap is not None else 0)
+
+    @property
+    def behavior_data(self):
+        return self.snapshot().behavior_data
+
+    def can_undo(self):
+        """Asked of the live manager, since snapshots have no store."""
+        return self._manager.can_undo()
+
+    def has_data(self):
+        """Whether a roster has been loaded, asked of the live manager rather than a new snapshot."""
+        with self._lock.read_lock():
+            return self._manager.has_data()
+
+    def __getattr__(self, name):
+        if name in self.WRITE_METHODS:
+            write = getattr(self._manager, name)
+
+            def locked_write(*args, **kwargs):
+                with self._lock.write_lock():
+                    return write(*args, **kwargs)
+            return locked_write
+        return getattr(self.snapshot(), name)
@@ -0,0 +1,374 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+import pandas as pd
+
+
+class BehaviorStore:
+    """Interface for durable behavior data backends used by DataManager.
+
+    A store holds the class roster (in display order) and one color per
+    (student, date). DataManager writes through to it on every change and
+    reads it back on startup instead of re-parsing an uploaded file.
+    """
+
+    supports_undo = False # Whether undo() can revert changes
+
+    def has_data(self):
+        """Return True if the store holds a roster"""
+        raise NotImplementedError
+
+    def load_frame(self):
+        """Return the roster and entries as a student/date/color DataFrame,
+        starting with a placeholder row (no date/color) per roster student"""
+        raise NotImplementedError
+
+    def replace_all(self, students, entries):
+        """Replace the whole store with a roster and (student, date, color) entries"""
+        raise NotImplementedError
+
+    def add_student(self, student_name):
+        """Append a student to the roster"""
+        raise NotImplementedError
+
+    def upsert_entry(self, student_name, date_str, color):
+        """Insert or overwrite the color for one (student, date)"""
+        raise NotImplementedError
+
+    def upsert_entries(self, entries):
+        """Insert or overwrite many (student, date, color) entries at once"""
+        raise NotImplementedError
+
+    def delete_entries(self, student_name=None):
+        """Delete the entries of one student, or of every student if None"""
+        raise NotImplementedError
+
+    def query(self, student_name=None, start_date=None, end_date=None):
+        """Return entries filtered by student and/or an inclusive date range"""
+        raise NotImplementedError
+
+    def undo(self):
+        """Revert the most recent entry, overwrite or clear; return False if
+        there is nothing to undo or the store keeps no history"""
+        return False
+
+    def memory_bytes(self):
+        """Return an estimate of the memory the store itself holds"""
+        return 0
+
+    def close(self):
+        pass
+
+
+class SQLiteStore(BehaviorStore):
+    """BehaviorStore backed by a SQLite database in WAL mode.
+
+    Entries are keyed by (student, date) with a secondary index on date, so
+    per-entry writes are a single small transaction and lookups by student
+    or date range use an index instead of a scan. Dates are stored as
+    'YYYY-MM-DD' text, which sorts chronologically.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS students (
+            name TEXT PRIMARY KEY,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            student TEXT NOT NULL,
+            date TEXT NOT NULL,
+            color TEXT NOT NULL,
+            PRIMARY KEY (student, date)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS entries_by_date ON entries (date, student);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Streamlit reruns scripts on different threads, so share one
+        # connection and serialize access to it ourselves
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._conn.commit()
+
+    def has_data(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM students LIMIT 1").fetchone() is not None
+
+    def load_frame(self):
+        with self._lock:
+            students = [row[0] for row in self._conn.execute("SELECT name FROM students ORDER BY position")]
+            entries = pd.read_sql_query("SELECT student, date, color FROM entries ORDER BY date, student", self._conn)
+
+        # One dateless row per student first, so the roster keeps its order
+        # and students without entries still appear
+        roster = pd.DataFrame({'student': students, 'date': None, 'color': None})
+        return pd.concat([roster, entries], ignore_index=True)
+
+    def replace_all(self, students, entries):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM students")
+            self._conn.executemany("INSERT INTO students (name, position) VALUES (?, ?)",
+                                   ((name, position) for position, name in enumerate(students)))
+            self._conn.executemany("INSERT OR REPLACE INTO entries (student, date, color) VALUES (?, ?, ?)", entries)
+
+    def add_student(self, student_name):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO students (name, position) SELECT ?, COALESCE(MAX(position) + 1, 0) FROM students",
+                (student_name,))
+
+    def upsert_entry(self, student_name, date_str, color):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO entries (student, date, color) VALUES (?, ?, ?)",
+                               (student_name, date_str, color))
+
+    def upsert_entries(self, entries):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO entries (student, date, color) VALUES (?, ?, ?)", entries)
+
+    def delete_entries(self, student_name=None):
+        with self._lock, self._conn:
+            if student_name is None:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE student = ?", (student_name,))
+
+    def query(self, student_name=None, start_date=None, end_date=None):
+        clauses, params = [], []
+        if student_name is not None:
+            clauses.append("student = ?")
+            params.append(student_name)
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+        sql = "SELECT student, date, color FROM entries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date, student"
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JournalStore(BehaviorStore):
+    """BehaviorStore kept as an append-only journal plus compacted snapshots.
+
+    Every write appends one JSON line to `journal.jsonl` in `directory`:
+    a "set" of (student, date, color, previous color) entries, which covers
+    new entries (no previous color) and overwrites, a "clear" of the
+    (student, date, color) entries removed, or a new "student". Every SNAPSHOT_EVERY records the
+    whole class is written to `snapshot.json` and the journal starts over,
+    so opening the store reads the snapshot and replays only the journal
+    tail. Records carry a sequence number and the snapshot the last one it
+    includes, so a crash between writing a snapshot and truncating the
+    journal replays nothing twice, and a torn last line is ignored.
+
+    Since set and clear records hold what they replaced, each has an exact
+    inverse: a set back to the previous colors, where no color means the
+    entry is removed. undo() appends that inverse as a new record. The last
+    UNDO_DEPTH changes can be undone, across restarts.
+
+    The full class is also kept in memory as a (student, date) -> color
+    dict, from which snapshots and load_frame() are built. With `sync`,
+    each append is fsynced before the write returns.
+    """
+
+    SNAPSHOT_EVERY = 1000
+    UNDO_DEPTH = 50
+    supports_undo = True
+    # An in-memory entry (dict slot, key tuple, date string), as measured
+    # with tracemalloc after recovering from a snapshot
+    ENTRY_BYTES = 260
+
+    def __init__(self, directory, sync=False):
+        self.directory = directory
+        self.sync = sync
+        self._snapshot_path = os.path.join(directory, 'snapshot.json')
+        self._journal_path = os.path.join(directory, 'journal.jsonl')
+        self._lock = threading.Lock()
+        self._students = []
+        self._entries = {}  # (student, 'YYYY-MM-DD') -> color
+        self._undo = deque(maxlen=self.UNDO_DEPTH) # Inverse records, newest last
+        self._seq = 0       # Sequence number of the last record applied
+        self._since_snapshot = 0
+
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._recover()
+            self._journal = open(self._journal_path, 'a', encoding='utf-8')
+
+    def has_data(self):
+        with self._lock:
+            return bool(self._students)
+
+    def memory_bytes(self):
+        with self._lock:
+            return self.ENTRY_BYTES * len(self._entries) + 100 * len(self._students)
+
+    def load_frame(self):
+        with self._lock:
+            students = list(self._students)
+            entries = sorted((date, student, color) for (student, date), color in self._entries.items())
+
+        # One dateless row per student first, so the roster keeps its order
+        # and students without entries still appear
+        roster = pd.DataFrame({'student': students, 'date': None, 'color': None})
+        entries = pd.DataFrame([(student, date, color) for date, student, color in entries], columns=['student', 'date', 'color'])
+        return pd.concat([roster, entries], ignore_index=True)
+
+    def replace_all(self, students, entries):
+        with self._lock:
+            self._students = list(students)
+            self._entries = {(student, date): color for student, date, color in entries}
+            # A new upload starts a new history
+            self._undo.clear()
+            self._write_snapshot()
+
+    def add_student(self, student_name):
+        with self._lock:
+            if student_name not in self._students:
+                self._append({'op': 'student', 'student': student_name})
+
+    def upsert_entry(self, student_name, date_str, color):
+        self.upsert_entries([(student_name, date_str, color)])
+
+    def upsert_entries(self, entries):
+        with self._lock:
+            changes = {}
+            for student, date, color in entries:
+                key = (student, date)
+                previous = changes[key][3] if key in changes else self._entries.get(key)
+                changes[key] = [student, date, color, previous]
+            if changes:
+                self._append({'op': 'set', 'entries': list(changes.values())})
+
+    def delete_entries(self, student_name=None):
+        with self._lock:
+            removed = [[student, date, color] for (student, date), color in self._entries.items()
+                       if student_name is None or student == student_name]
+            if removed:
+                self._append({'op': 'clear', 'entries': removed})
+
+    def query(self, student_name=None, start_date=None, end_date=None):
+        start = pd.Timestamp(start_date).strftime('%Y-%m-%d') if start_date is not None else None
+        end = pd.Timestamp(end_date).strftime('%Y-%m-%d') if end_date is not None else None
+        with self._lock:
+            rows = sorted(
+                (date, student, color) for (student, date), color in self._entries.items()
+                if (student_name is None or student == student_name)
+                and (start is None or date >= start) and (end is None or date <= end))
+        return pd.DataFrame([(student, date, color) for date, student, color in rows], columns=['student', 'date', 'color'])
+
+    def undo(self):
+        with self._lock:
+            if not self._undo:
+                return False
+            record = dict(self._undo[-1], undo=True)
+            self._append(record)
+            return True
+
+    def close(self):
+        with self._lock:
+            self._journal.close()
+
+    def _append(self, record):
+        """Applies a record and appends it to the journal; compacts when due."""
+        self._seq += 1
+        record = dict(record, seq=self._seq)
+        self._journal.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.sync:
+            os.fsync(self._journal.fileno())
+        self._apply(record)
+
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.SNAPSHOT_EVERY:
+            self._write_snapshot()
+
+    def _apply(self, record):
+        """Applies one journal record to the in-memory state and undo history."""
+        op = record['op']
+        if op == 'student':
+            if record['student'] not in self._students:
+                self._students.append(record['student'])
+            return
+        if op == 'set':
+            changes = record['entries']
+        else:
+            changes = [[student, date, None, color] for student, date, color in record['entries']]
+
+        for student, date, color, _ in changes:
+            if color is None:
+                self._entries.pop((student, date), None)
+            else:
+                self._entries[(student, date)] = color
+
+        if record.get('undo'):
+            self._undo.pop()
+        else:
+            self._undo.append({'op': 'set', 'entries': [[student, date, previous, color] for student, date, color, previous in changes]})
+
+    def _recover(self):
+        """Loads the latest snapshot, then replays the journal records after it."""
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self._seq = snapshot['seq']
+            self._students = snapshot['students']
+            self._entries = {(student, date): color for student, date, color in snapshot['entries']}
+            self._undo.extend(snapshot.get('undo', []))
+
+        if os.path.exists(self._journal_path):
+            good_end = 0 # Byte offset just past the last complete record
+            with open(self._journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError
+                        record = json.loads(line)
+                    except ValueError:
+                        break # A write torn by a crash; nothing valid follows it
+                    good_end += len(line)
+                    if record['seq'] > self._seq:
+                        self._seq = record['seq']
+                        self._apply(record)
+                        self._since_snapshot += 1
+            # Cut off a torn write, so new records do not get appended to it
+            if good_end < os.path.getsize(self._journal_path):
+                with open(self._journal_path, 'r+b') as f:
+                    f.truncate(good_end)
+
+    def _write_snapshot(self):
+        """Writes the whole class to a new snapshot, then starts an empty journal."""
+        snapshot = {
+            'seq': self._seq,
+            'students': self._students,
+            'entries': [[student, date, color] for (student, date), color in self._entries.items()],
+            'undo': list(self._undo),
+        }
+        temp_path = self._snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._snapshot_path)
+
+        # Records up to seq are now in the snapshot
+        if getattr(self, '_journal', None) is not None:
+            self._journal.close()
+        self._journal = open(self._journal_path, 'w', encoding='utf-8')
+        self._since_snapshot = 0
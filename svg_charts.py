@@ -0,0 +1,123 @@
+import math
+from html import escape
+
+# Small static SVG versions of the report charts. They are drawn directly
+# from counts and dates, need no JavaScript, and are a few KB each, which
+# keeps class-wide printable reports small enough to open instantly.
+
+FONT = "font-family=\"Poppins, sans-serif\""
+
+
+def pie_svg(color_counts, colors, size=300):
+    """Pie chart of entries per color, labelled with color and percentage."""
+    total = sum(color_counts.get(color, 0) for color in colors)
+    if total == 0:
+        return _empty_svg(size, size)
+
+    cx = cy = size / 2
+    radius = size / 2 - 10
+    parts = []
+    labels = []
+    angle = -math.pi / 2 # Start at 12 o'clock, going clockwise
+    for color, hex_code in colors.items():
+        count = color_counts.get(color, 0)
+        if count == 0:
+            continue
+        fraction = count / total
+        sweep = fraction * 2 * math.pi
+        if fraction >= 1:
+            parts.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{radius:.1f}" fill="{hex_code}"/>')
+        else:
+            x1, y1 = cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+            x2, y2 = cx + radius * math.cos(angle + sweep), cy + radius * math.sin(angle + sweep)
+            large_arc = 1 if sweep > math.pi else 0
+            parts.append(f'<path d="M{cx:.1f},{cy:.1f} L{x1:.1f},{y1:.1f} A{radius:.1f},{radius:.1f} 0 {large_arc} 1 {x2:.1f},{y2:.1f} Z" '
+                         f'fill="{hex_code}" stroke="#fff" stroke-width="1"/>')
+        if fraction >= 0.05:
+            mid = angle + sweep / 2
+            lx, ly = cx + radius * 0.62 * math.cos(mid), cy + radius * 0.62 * math.sin(mid)
+            labels.append(f'<text x="{lx:.1f}" y="{ly:.1f}" text-anchor="middle" font-size="11" fill="#fff" {FONT}>'
+                          f'<tspan x="{lx:.1f}">{escape(color)}</tspan><tspan x="{lx:.1f}" dy="13">{fraction * 100:.1f}%</tspan></text>')
+        angle += sweep
+
+    return _svg(size, size, "".join(parts) + "".join(labels))
+
+
+def bar_svg(percentages, colors, width=300, height=300):
+    """Bar chart of the percentage of entries per color."""
+    left, right, top, bottom = 40, 10, 10, 40
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+    top_value = max(10, math.ceil(max(percentages.values(), default=0) / 10) * 10)
+
+    parts = []
+    # Horizontal grid lines and y axis labels
+    for i in range(5):
+        value = top_value * i / 4
+        y = top + plot_height - plot_height * value / top_value
+        parts.append(f'<line x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}" stroke="#e5e5e5"/>')
+        parts.append(f'<text x="{left - 5}" y="{y + 4:.1f}" text-anchor="end" font-size="10" {FONT}>{value:g}</text>')
+
+    slot = plot_width / max(1, len(colors))
+    for i, (color, hex_code) in enumerate(colors.items()):
+        value = percentages.get(color, 0)
+        bar_height = plot_height * value / top_value
+        x = left + i * slot + slot * 0.15
+        y = top + plot_height - bar_height
+        parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{slot * 0.7:.1f}" height="{bar_height:.1f}" fill="{hex_code}"/>')
+        parts.append(f'<text x="{x + slot * 0.35:.1f}" y="{height - bottom + 14}" text-anchor="middle" font-size="9" {FONT}>{escape(color)}</text>')
+
+    parts.append(f'<line x1="{left}" y1="{top + plot_height}" x2="{width - right}" y2="{top + plot_height}" stroke="#999"/>')
+    parts.append(f'<text x="12" y="{top + plot_height / 2:.1f}" text-anchor="middle" font-size="10" transform="rotate(-90 12 {top + plot_height / 2:.1f})" {FONT}>Percentage (%)</text>')
+    return _svg(width, height, "".join(parts))
+
+
+def timeline_svg(dates, entry_colors, colors, width=650, height=300):
+    """Timeline of recent entries: one marker per day, one row per color (worst at the bottom)."""
+    if not dates:
+        return _empty_svg(width, height)
+
+    left, right, top, bottom = 60, 20, 15, 40
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+    color_names = list(colors.keys())
+    row_height = plot_height / len(color_names)
+
+    days = [date.toordinal() for date in dates]
+    first_day, last_day = min(days), max(days)
+    span = max(1, last_day - first_day)
+
+    def x_for(day):
+        if first_day == last_day:
+            return left + plot_width / 2
+        return left + 15 + (plot_width - 30) * (day - first_day) / span
+
+    def y_for(color):
+        # First color in the list sits at the bottom, as on the Plotly chart
+        return top + plot_height - row_height * (color_names.index(color) + 0.5)
+
+    parts = []
+    for color in color_names:
+        y = y_for(color)
+        parts.append(f'<line x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}" stroke="#eee"/>')
+        parts.append(f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end" font-size="10" {FONT}>{escape(color)}</text>')
+
+    for date, day in sorted(set(zip(dates, days)), key=lambda item: item[1]):
+        x = x_for(day)
+        parts.append(f'<text x="{x:.1f}" y="{height - bottom + 16}" text-anchor="middle" font-size="9" {FONT}>{date.strftime("%m/%d")}</text>')
+
+    for day, color in zip(days, entry_colors):
+        if color not in colors:
+            continue
+        parts.append(f'<circle cx="{x_for(day):.1f}" cy="{y_for(color):.1f}" r="7.5" fill="{colors[color]}" stroke="black" stroke-width="2"/>')
+
+    parts.append(f'<text x="{left + plot_width / 2:.1f}" y="{height - 6}" text-anchor="middle" font-size="10" {FONT}>Date</text>')
+    return _svg(width, height, "".join(parts))
+
+
+def _svg(width, height, body):
+    return f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">{body}</svg>'
+
+
+def _empty_svg(width, height):
+    return _svg(width, height, f'<text x="{width / 2}" y="{height / 2}" text-anchor="middle" font-size="12" fill="#888" {FONT}>No data</text>')
@@ -0,0 +1,7 @@
+import benchmark
+
+
+def test_app_imports_stay_lazy_and_within_budget():
+    runs, eager = benchmark.measure_app_imports(repeat=3)
+    assert eager == [], f"app.py loads {', '.join(eager)} at startup"
+    assert min(runs) * 1000 <= benchmark.APP_IMPORT_BUDGET_MS
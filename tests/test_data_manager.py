@@ -0,0 +1,145 @@
+import io
+import random
+
+import numpy as np
+import pytest
+
+from data_manager import DataManager, _KeyIndex
+
+
+def upload(name, text):
+    uploaded = io.BytesIO(text.encode())
+    uploaded.name = name
+    return uploaded
+
+
+def test_skipped_rows_report_physical_line_numbers():
+    data_manager = DataManager()
+    success, _ = data_manager.load_data_from_file(upload('class.csv', (
+        "student,date,color\n"
+        "Ann,2024-01-08,Green\n"
+        "\n"
+        "\n"
+        "Bob,2024-01-08,Mauve\n")))
+    assert success
+    assert data_manager.last_load_issues == ["Line 5: unknown color"]
+    assert data_manager.get_student_list() == ['Ann', 'Bob']
+
+
+def merge_sources():
+    return [
+        upload('a.csv', "student,date,color\nAnn,2024-01-08,Red\nAnn,2024-01-08,Green\nBob,2024-01-08,Blue\n"),
+        upload('b.csv', "student,date,color\nBob,2024-01-08,Pink\nBob,2024-01-09,Yellow\nCat,2024-01-08,Red\n"),
+    ]
+
+
+def colors_by_day(data_manager):
+    entries = data_manager.get_range()
+    return {(student, day.strftime('%Y-%m-%d')): color
+            for student, day, color in zip(entries['student'], entries['date'], entries['color'])}
+
+
+@pytest.mark.parametrize('policy, kept', [('last', 'Pink'), ('worst', 'Blue'), ('best', 'Pink')])
+def test_merge_policy_settles_conflicts_between_files(policy, kept):
+    data_manager = DataManager()
+    success, message = data_manager.merge_data_from_files(merge_sources(), policy=policy)
+
+    assert success, message
+    assert data_manager.get_student_list() == ['Ann', 'Bob', 'Cat']
+    assert colors_by_day(data_manager) == {
+        ('Ann', '2024-01-08'): 'Green', # Repeated within a.csv: its last row wins whatever the policy
+        ('Bob', '2024-01-08'): kept,
+        ('Bob', '2024-01-09'): 'Yellow',
+        ('Cat', '2024-01-08'): 'Red',
+    }
+    conflicts = data_manager.last_merge_conflicts
+    assert conflicts[['student', 'source', 'color']].values.tolist() == [['Bob', 'a.csv', 'Blue'], ['Bob', 'b.csv', 'Pink']]
+    assert set(conflicts['kept']) == {kept}
+
+
+def test_merge_treats_current_data_as_the_first_source():
+    data_manager = DataManager()
+    data_manager.load_data_from_file(upload('class.csv', "student,date,color\nZed,2024-01-08,Purple\nBob,2024-01-08,Red\n"))
+    success, _ = data_manager.merge_data_from_files(merge_sources(), policy='worst')
+
+    assert success
+    assert data_manager.get_student_list() == ['Zed', 'Bob', 'Ann', 'Cat']
+    assert colors_by_day(data_manager)[('Bob', '2024-01-08')] == 'Red'
+    assert set(data_manager.last_merge_conflicts['source']) == {'Current data', 'a.csv', 'b.csv'}
+
+
+def test_merge_leaves_data_alone_when_a_file_is_unreadable():
+    data_manager = DataManager()
+    data_manager.load_data_from_file(upload('class.csv', "student,date,color\nZed,2024-01-08,Purple\n"))
+    success, _ = data_manager.merge_data_from_files(merge_sources() + [upload('bad.csv', "student,date\nAnn,2024-01-08\n")])
+
+    assert not success
+    assert colors_by_day(data_manager) == {('Zed', '2024-01-08'): 'Purple'}
+
+
+def test_key_index_finds_merged_and_overflow_keys(monkeypatch):
+    monkeypatch.setattr(_KeyIndex, 'MIN_OVERFLOW', 2)
+    index = _KeyIndex(np.array([30, 10, 20]))
+    assert [index.get(key) for key in (10, 20, 30, 40)] == [1, 2, 0, None]
+
+    index.add(5, 3)
+    index.add(25, 4)
+    assert index.get(5) == 3 and len(index) == 5
+    index.add(35, 5) # Outgrows the overflow, which is merged into the arrays
+    assert not index._overflow
+    index.add_many(np.array([1, 40]), np.array([6, 7]))
+
+    copy = index.copy()
+    copy.add(50, 8)
+    assert index.get(50) is None
+    assert index.lookup(np.array([1, 5, 10, 15, 25, 35, 40])).tolist() == [6, 3, 1, -1, 4, 5, 7]
+
+
+def test_overwriting_an_entry_moves_its_count():
+    data_manager = DataManager()
+    data_manager.load_data_from_file(upload('class.csv', "student,date,color\nAnn,2024-01-08,Red\nBob,2024-01-08,Blue\n"))
+    assert data_manager.add_behavior_entry('Ann', 'Green', '2024-01-08')
+    # Within a batch the last entry for a student and day wins, and counts once
+    assert data_manager.add_behavior_entries([('Bob', 'Red', '2024-01-08'), ('Bob', 'Pink', '2024-01-08')]) == 1
+
+    assert colors_by_day(data_manager) == {('Ann', '2024-01-08'): 'Green', ('Bob', '2024-01-08'): 'Pink'}
+    assert data_manager.get_color_counts('Ann').to_dict() == {
+        'Red': 0, 'Orange': 0, 'Yellow': 0, 'Green': 1, 'Blue': 0, 'Purple': 0, 'Pink': 0}
+    assert data_manager.get_color_counts('Bob').sum() == 1
+
+
+def test_random_upserts_match_a_plain_dict(monkeypatch):
+    # A small overflow makes the index merge often along the way
+    monkeypatch.setattr(_KeyIndex, 'MIN_OVERFLOW', 4)
+    rng = random.Random(7)
+    students = ['Ann', 'Bob', 'Cat', 'Dan', 'Eve']
+    days = [f'2024-02-{day:02d}' for day in range(1, 29)]
+
+    data_manager = DataManager()
+    data_manager.load_data_from_file(upload('class.csv', "student\n" + "\n".join(students[:3]) + "\n"))
+    expected = {}
+    snapshot, snapshot_expected = None, None
+    for step in range(300):
+        action = rng.random()
+        if action < 0.6:
+            entry = (rng.choice(students), rng.choice(data_manager.color_names), rng.choice(days))
+            assert data_manager.add_behavior_entry(*entry)
+            expected[entry[0], entry[2]] = entry[1]
+        elif action < 0.95:
+            batch = [(rng.choice(students), rng.choice(data_manager.color_names), rng.choice(days))
+                     for _ in range(rng.randint(1, 20))]
+            assert data_manager.add_behavior_entries(batch) == len({(name, day) for name, _, day in batch})
+            expected.update({(name, day): color for name, color, day in batch})
+        else:
+            student = rng.choice(students)
+            data_manager.clear_student_data(student)
+            expected = {key: color for key, color in expected.items() if key[0] != student}
+        if step == 150:
+            snapshot, snapshot_expected = data_manager.snapshot(), dict(expected)
+
+    assert colors_by_day(data_manager) == expected
+    assert colors_by_day(snapshot) == snapshot_expected
+    for student in students:
+        counts = data_manager.get_color_counts(student)
+        for color in data_manager.color_names:
+            assert counts[color] == sum(1 for key, kept in expected.items() if key[0] == student and kept == color)
@@ -0,0 +1,38 @@
+from storage import JournalStore
+
+
+def test_journal_recovers_after_torn_write(tmp_path):
+    store = JournalStore(str(tmp_path))
+    store.replace_all(['Ann', 'Bob'], [('Ann', '2024-01-08', 'Green')])
+    store.upsert_entry('Bob', '2024-01-08', 'Red')
+    store.close()
+
+    # A crash part way through appending a record
+    with open(tmp_path / 'journal.jsonl', 'a', encoding='utf-8') as f:
+        f.write('{"op":"set","entries":[["Ann","2024-01-0')
+
+    store = JournalStore(str(tmp_path))
+    store.upsert_entry('Ann', '2024-01-09', 'Blue')
+    store.upsert_entry('Bob', '2024-01-09', 'Pink')
+    store.close()
+
+    store = JournalStore(str(tmp_path))
+    entries = store.query()
+    store.close()
+    assert sorted(map(tuple, entries.to_numpy().tolist())) == [
+        ('Ann', '2024-01-08', 'Green'), ('Ann', '2024-01-09', 'Blue'),
+        ('Bob', '2024-01-08', 'Red'), ('Bob', '2024-01-09', 'Pink'),
+    ]
+
+
+def test_journal_undo_survives_restart(tmp_path):
+    store = JournalStore(str(tmp_path))
+    store.replace_all(['Ann'], [('Ann', '2024-01-08', 'Green')])
+    store.upsert_entry('Ann', '2024-01-08', 'Red')
+    store.close()
+
+    store = JournalStore(str(tmp_path))
+    assert store.undo()
+    assert store.query()['color'].tolist() == ['Green']
+    assert not store.undo()
+    store.close()
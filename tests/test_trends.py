@@ -0,0 +1,76 @@
+import io
+import random
+
+import numpy as np
+import pandas as pd
+
+from behavior_tracker import week_start
+from data_manager import DataManager
+from trends import TrendAnalytics
+
+
+def load(data_manager, text):
+    uploaded = io.BytesIO(text.encode())
+    uploaded.name = 'class.csv'
+    success, message = data_manager.load_data_from_file(uploaded)
+    assert success, message
+
+
+def test_week_start_is_the_monday_of_the_week():
+    days = np.array(['2024-01-08', '2024-01-11', '2024-01-14', '2024-01-15'], dtype='datetime64[D]')
+    assert week_start(days).astype(str).tolist() == ['2024-01-08', '2024-01-08', '2024-01-08', '2024-01-15']
+
+
+def test_summary_figures():
+    data_manager = DataManager()
+    load(data_manager, (
+        "student,date,color\n"
+        "Ann,2024-01-01,Red\n"     # Monday of the week before
+        "Ann,2024-01-08,Green\n"
+        "Ann,2024-01-09,Red\n"
+        "Ann,2024-01-10,Blue\n"
+        "Ann,2024-01-11,Pink\n"
+        "Bob,,\n"))
+    summary = TrendAnalytics(data_manager.tracker).update(data_manager).summary()
+
+    ann = summary.loc['Ann']
+    assert ann['good_pct_7d'] == 70.0
+    assert ann['good_pct_30d'] == 53.8
+    assert (ann['current_streak'], ann['longest_streak']) == (2, 2)
+    assert (ann['this_week_pct'], ann['last_week_pct'], ann['week_over_week']) == (70.0, 0.0, 70.0)
+    bob = summary.loc['Bob']
+    assert np.isnan(bob['good_pct_7d']) and bob['current_streak'] == 0
+
+
+def test_days_without_an_entry_do_not_break_a_streak():
+    data_manager = DataManager()
+    load(data_manager, "student,date,color\nAnn,2024-01-08,Green\nBob,2024-01-09,Red\nAnn,2024-01-10,Blue\n")
+    summary = TrendAnalytics(data_manager.tracker).update(data_manager).summary()
+    assert summary.loc['Ann', 'current_streak'] == 2
+    assert summary.loc['Bob', 'current_streak'] == 0
+
+
+def test_incremental_updates_match_a_fresh_rebuild():
+    rng = random.Random(7)
+    data_manager = DataManager()
+    students = [f"Student {i}" for i in range(12)]
+    days = pd.date_range('2024-01-01', periods=60).strftime('%Y-%m-%d').tolist()
+    colors = data_manager.color_names
+    load(data_manager, "student,date,color\n" + "".join(
+        f"{student},{day},{rng.choice(colors)}\n" for student in students for day in days if rng.random() < 0.7))
+
+    trends = TrendAnalytics(data_manager.tracker).update(data_manager)
+    for step in range(40):
+        action = rng.random()
+        if action < 0.6:
+            # Mostly recent days, sometimes well back, and a new day now and then
+            day = rng.choice([rng.choice(days[-7:]), rng.choice(days[-7:]), rng.choice(days), f"2024-03-{rng.randint(1, 20):02d}"])
+            data_manager.add_behavior_entry(rng.choice(students + ['New Student']), rng.choice(colors), day)
+        elif action < 0.9:
+            data_manager.add_behavior_entries([(rng.choice(students), rng.choice(colors), rng.choice(days)) for _ in range(5)])
+        else:
+            data_manager.clear_student_data(rng.choice(students))
+
+        as_of = rng.choice([None, '2024-02-10'])
+        expected = TrendAnalytics(data_manager.tracker).update(data_manager).summary(as_of)
+        pd.testing.assert_frame_equal(trends.update(data_manager).summary(as_of), expected)
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from behavior_tracker import week_start
+from profiling import timed
+
+
+class TrendAnalytics:
+    """Rolling good-behavior %, streaks and week-over-week change for every student.
+
+    Works on a students x days grid (the days that have any entry, as from
+    DataManager.get_color_codes_since) kept as running sums of good and bad
+    points, plus each student's Green-or-better streak length on each day.
+    A "good" day is one whose color earns good points, so the streak counts
+    consecutive entries of Green or better; days without an entry for a
+    student neither extend nor break it.
+
+    update() brings the grid up to date with a DataManager. It asks the
+    manager which days changed since the version it last saw
+    (DataManager.get_changes_since) and recomputes only from the earliest
+    of them, so recording today's colors costs one new column rather than a
+    pass over the whole history. Uploads and clears rebuild everything.
+
+    Percentages follow BehaviorTracker: good points over all points, here
+    summed over the window. Windows and weeks are calendar based and end on
+    the `as_of` day, by default the last day with an entry.
+    """
+
+    WINDOWS = (7, 30)
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self._version = None
+        self._students = []
+        self._days = np.empty(0, dtype='datetime64[D]')
+        # Running sums with a leading column of zeros: column j holds the
+        # points of the first j days, so any window is a difference of two
+        self._good_sums = np.zeros((0, 1), dtype=np.int64)
+        self._bad_sums = np.zeros((0, 1), dtype=np.int64)
+        self._streaks = np.zeros((0, 0), dtype=np.int32) # Streak length at the end of each day
+        self._longest = np.zeros(0, dtype=np.int32)
+
+    @timed
+    def update(self, data_manager):
+        """Applies the changes made to data_manager since the last update; returns self."""
+        version = data_manager.get_version()
+        if version == self._version:
+            return self
+
+        students = data_manager.get_student_list()
+        since = data_manager.get_changes_since(self._version) if self._version is not None else data_manager.ANY_DAY
+        if students[:len(self._students)] != self._students:
+            # The roster was replaced, not extended
+            since = data_manager.ANY_DAY
+            self._resize(0)
+        self._resize(len(students))
+        self._students = students
+
+        if since is not None:
+            self._recompute_from(data_manager, since)
+        self._version = version
+        return self
+
+    @timed
+    def summary(self, as_of=None):
+        """Returns one row of trend figures per student, indexed by student name.
+
+        Columns are the rolling good-behavior % over each of WINDOWS
+        (`good_pct_7d`, `good_pct_30d`), `current_streak` and
+        `longest_streak` (in entries), and the good-behavior % of the week
+        so far (`this_week_pct`), last week (`last_week_pct`) and their
+        difference in percentage points (`week_over_week`). Percentages are
+        NaN when the period has no entries.
+        """
+        if not len(self._days):
+            return self._empty_summary()
+        as_of = self._days[-1] if as_of is None else np.datetime64(pd.Timestamp(as_of).date(), 'D')
+        end = np.searchsorted(self._days, as_of, side='right')
+
+        summary = {}
+        for window in self.WINDOWS:
+            summary[f'good_pct_{window}d'] = self._good_percentage(as_of - (window - 1), end)
+        if end:
+            summary['current_streak'] = self._streaks[:, end - 1]
+            summary['longest_streak'] = self._longest if end == len(self._days) else self._streaks[:, :end].max(axis=1)
+        else:
+            summary['current_streak'] = summary['longest_streak'] = np.zeros(len(self._students), dtype=np.int32)
+
+        this_monday = week_start(as_of)
+        this_week = self._good_percentage(this_monday, end)
+        last_week = self._good_percentage(this_monday - 7, np.searchsorted(self._days, this_monday, side='left'))
+        summary['this_week_pct'] = this_week
+        summary['last_week_pct'] = last_week
+        summary['week_over_week'] = np.round(this_week - last_week, 1)
+        return pd.DataFrame(summary, index=pd.Index(self._students, name='student'))
+
+    def trending_down(self, as_of=None, min_drop=0.0):
+        """Students whose good-behavior % fell from last week by more than
+        `min_drop` points, biggest drop first."""
+        summary = self.summary(as_of)
+        return summary[summary['week_over_week'] < -min_drop].sort_values('week_over_week')
+
+    def _recompute_from(self, data_manager, since):
+        """Drops the columns from `since` on and rebuilds them from the manager's data."""
+        keep = int(np.searchsorted(self._days, since, side='left'))
+        truncated = keep < len(self._days)
+        self._days = self._days[:keep]
+        self._good_sums = self._good_sums[:, :keep + 1]
+        self._bad_sums = self._bad_sums[:, :keep + 1]
+        self._streaks = self._streaks[:, :keep]
+        if truncated:
+            self._longest = self._streaks.max(axis=1) if keep else np.zeros(len(self._students), dtype=np.int32)
+
+        days, codes = data_manager.get_color_codes_since(since)
+        if not len(days):
+            return
+
+        recorded = codes != data_manager.NO_COLOR
+        points = self.tracker.scheme.points_from_codes(codes) # 0 where nothing was recorded
+        good = points > 0
+
+        self._days = np.concatenate([self._days, days])
+        self._good_sums = np.hstack([self._good_sums, self._good_sums[:, -1:] + np.cumsum(np.clip(points, 0, None), axis=1)])
+        self._bad_sums = np.hstack([self._bad_sums, self._bad_sums[:, -1:] + np.cumsum(np.clip(-points, 0, None), axis=1)])
+
+        # One vectorized step per new day: a good entry extends the streak,
+        # any other entry ends it, and no entry leaves it as it was
+        streak = self._streaks[:, -1].copy() if keep else np.zeros(len(self._students), dtype=np.int32)
+        new_streaks = np.empty(codes.shape, dtype=np.int32)
+        for day in range(codes.shape[1]):
+            streak = np.where(recorded[:, day], np.where(good[:, day], streak + 1, 0), streak)
+            new_streaks[:, day] = streak
+        self._streaks = np.hstack([self._streaks, new_streaks])
+        self._longest = np.maximum(self._longest, new_streaks.max(axis=1))
+
+    def _good_percentage(self, start_day, end):
+        """Good-behavior % per student over the day columns from start_day up to column `end`."""
+        start = np.searchsorted(self._days, start_day, side='left')
+        start = min(start, end)
+        good = self._good_sums[:, end] - self._good_sums[:, start]
+        total = good + self._bad_sums[:, end] - self._bad_sums[:, start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.round(np.where(total > 0, good / total * 100, np.nan), 1)
+
+    def _resize(self, n_students):
+        """Grows (with empty history) or truncates the per-student arrays to n_students rows."""
+        n_days = len(self._days) if n_students else 0
+        if not n_students:
+            self._days = self._days[:0]
+
+        def fit(array, columns):
+            rows = min(len(array), n_students)
+            resized = np.zeros((n_students, columns) if array.ndim == 2 else n_students, dtype=array.dtype)
+            if array.ndim == 2:
+                resized[:rows] = array[:rows, :columns]
+            else:
+                resized[:rows] = array[:rows]
+            return resized
+
+        self._good_sums = fit(self._good_sums, n_days + 1)
+        self._bad_sums = fit(self._bad_sums, n_days + 1)
+        self._streaks = fit(self._streaks, n_days)
+        self._longest = fit(self._longest, None)
+
+    def _empty_summary(self):
+        columns = [f'good_pct_{window}d' for window in self.WINDOWS] + [
+            'current_streak', 'longest_streak', 'this_week_pct', 'last_week_pct', 'week_over_week']
+        summary = pd.DataFrame(np.nan, index=pd.Index(self._students, name='student'), columns=columns)
+        summary[['current_streak', 'longest_streak']] = 0
+        return summary
@@ -0,0 +1,155 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from behavior_tracker import BehaviorTracker
+from data_manager import DataManager
+from shared_store import SharedDataManager
+from storage import JournalStore, SQLiteStore
+
+
+# Class ids become file names, so keep them to plain names
+CLASS_ID_PATTERN = re.compile(r'^[\w][\w .-]*$')
+
+
+def check_class_id(class_id):
+    """Raises ValueError unless class_id is a plain name that is safe to use as a file name."""
+    if not isinstance(class_id, str) or not CLASS_ID_PATTERN.match(class_id):
+        raise ValueError(f"Invalid class name {class_id!r}")
+
+
+class ClassWorkspace:
+    """Many classes on one instance, each in its own DataManager shard.
+
+    Every class is kept in its own durable store in `directory`, a
+    `<class>.sqlite` database or, with store='journal', a `<class>.journal`
+    directory (see storage.py). get() loads a class's shard on first use
+    and returns it as a SharedDataManager, so sessions viewing the same
+    class share it.
+
+    Loaded shards are kept in least-recently-used order, and whenever their
+    estimated memory (DataManager.memory_bytes, which counts the store's own
+    copy too) exceeds `memory_budget` bytes the least recently used ones are
+    dropped; their data stays in the store and is reloaded on the next
+    get(). A shard is only dropped once nobody has asked for it for
+    `min_idle` seconds, so fetch the shard with get() on every request
+    rather than holding on to it.
+
+    Cross-class queries such as weekly_good_percentage() run per shard in
+    a thread pool and merge the partial results. Classes that are not
+    loaded are read from their store for the query without being cached.
+    """
+
+    STORE_SUFFIXES = {'sqlite': '.sqlite', 'journal': '.journal'}
+    DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+    def __init__(self, directory, store='sqlite', tracker=None, memory_budget=DEFAULT_MEMORY_BUDGET, min_idle=60, workers=None):
+        if store not in self.STORE_SUFFIXES:
+            raise ValueError(f"Unknown store type {store!r}; expected one of {', '.join(self.STORE_SUFFIXES)}")
+        self.directory = directory
+        self.store = store
+        self.tracker = tracker if tracker is not None else BehaviorTracker()
+        self.memory_budget = memory_budget
+        self.min_idle = min_idle
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self._shards = OrderedDict() # class id -> (SharedDataManager, last used time), oldest first
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def class_ids(self):
+        """Returns the ids of every class in the workspace, sorted."""
+        suffix = self.STORE_SUFFIXES[self.store]
+        with self._lock:
+            loaded = set(self._shards)
+        on_disk = {name[:-len(suffix)] for name in os.listdir(self.directory) if name.endswith(suffix)}
+        return sorted(loaded | on_disk)
+
+    def get(self, class_id):
+        """Returns the shard for a class, loading it (or creating an empty class) if needed."""
+        check_class_id(class_id)
+        with self._lock:
+            entry = self._shards.get(class_id)
+            if entry is None:
+                shard = SharedDataManager(self._open_manager(class_id))
+            else:
+                shard = entry[0]
+                self._shards.move_to_end(class_id)
+            self._shards[class_id] = (shard, time.monotonic())
+            self._evict()
+        return shard
+
+    def loaded_class_ids(self):
+        """Returns the ids of the classes currently held in memory, least recently used first."""
+        with self._lock:
+            return list(self._shards)
+
+    def memory_bytes(self):
+        """Returns the estimated memory held by the loaded shards."""
+        with self._lock:
+            shards = [shard for shard, _ in self._shards.values()]
+        return sum(shard.memory_bytes() for shard in shards)
+
+    def map_classes(self, fn, class_ids=None):
+        """Calls fn(class_id, data_manager) for each class in parallel; returns {class_id: result}.
+
+        Loaded classes are read from a snapshot of their shard; the rest are
+        loaded from their store just for the call.
+        """
+        class_ids = self.class_ids() if class_ids is None else list(class_ids)
+
+        def run(class_id):
+            with self._lock:
+                entry = self._shards.get(class_id)
+            data_manager = entry[0].snapshot() if entry is not None else self._open_manager(class_id)
+            try:
+                return fn(class_id, data_manager)
+            finally:
+                if entry is None and data_manager.store is not None:
+                    data_manager.store.close()
+
+        if len(class_ids) <= 1 or self.workers <= 1:
+            return {class_id: run(class_id) for class_id in class_ids}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(zip(class_ids, pool.map(run, class_ids)))
+
+    def weekly_good_percentage(self, start_date=None, end_date=None, class_ids=None):
+        """School-wide good-behavior percentage per week across classes.
+
+        Returns a DataFrame indexed by week (the Monday that starts it) with
+        total_good_points, total_bad_points, good_percentage and the number
+        of classes with entries that week.
+        """
+        partials = self.map_classes(
+            lambda _, data_manager: self.tracker.summarize_points_by_week(data_manager.get_range(start_date, end_date)),
+            class_ids)
+        partials = [partial.assign(classes=1) for partial in partials.values() if not partial.empty]
+        columns = ['total_good_points', 'total_bad_points', 'good_percentage', 'classes']
+        if not partials:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='week'))
+
+        weekly = pd.concat(partials).groupby(level='week').sum()
+        totals = weekly['total_good_points'] + weekly['total_bad_points']
+        weekly['good_percentage'] = (weekly['total_good_points'] / totals.where(totals > 0) * 100).fillna(0).round(1)
+        return weekly[columns]
+
+    def _open_manager(self, class_id):
+        path = os.path.join(self.directory, class_id + self.STORE_SUFFIXES[self.store])
+        store = JournalStore(path) if self.store == 'journal' else SQLiteStore(path)
+        return DataManager(tracker=self.tracker, store=store)
+
+    def _evict(self):
+        """Drops idle least-recently-used shards until the rest fit the memory budget."""
+        sizes = {class_id: shard.memory_bytes() for class_id, (shard, _) in self._shards.items()}
+        total = sum(sizes.values())
+        now = time.monotonic()
+        for class_id, (_, last_used) in list(self._shards.items()):
+            if total <= self.memory_budget:
+                break
+            if now - last_used < self.min_idle:
+                continue
+            # The shard's store closes with it once the last reference is gone
+            del self._shards[class_id]
+            total -= sizes[class_id]